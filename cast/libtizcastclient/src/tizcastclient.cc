@@ -385,6 +385,11 @@ tizcastclient::media_status (const std::vector< uint8_t > & uuid,
           TIZ_LOG (TIZ_PRIORITY_TRACE, "media status [Playing]");
         }
         break;
+      case ETizCcMediaStatusQueueItemChanged:
+        {
+          TIZ_LOG (TIZ_PRIORITY_TRACE, "media status [QueueItemChanged]");
+        }
+        break;
       default:
         {
           assert (0);
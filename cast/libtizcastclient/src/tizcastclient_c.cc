@@ -69,7 +69,8 @@ static const tiz_cast_client_media_status_str_t
      {ETizCcMediaStatusIdle, (const char *) "Idle"},
      {ETizCcMediaStatusBuffering, (const char *) "Buffering"},
      {ETizCcMediaStatusPaused, (const char *) "Paused"},
-     {ETizCcMediaStatusPlaying, (const char *) "Playing"}};
+     {ETizCcMediaStatusPlaying, (const char *) "Playing"},
+     {ETizCcMediaStatusQueueItemChanged, (const char *) "QueueItemChanged"}};
 
 typedef struct tiz_cast_client_error_status_str
 {
@@ -54,7 +54,10 @@ typedef enum tiz_cast_client_media_status {
   ETizCcMediaStatusIdle,
   ETizCcMediaStatusBuffering,
   ETizCcMediaStatusPaused,
-  ETizCcMediaStatusPlaying
+  ETizCcMediaStatusPlaying,
+  ETizCcMediaStatusQueueItemChanged /**< The receiver has moved on to the
+                                       next item of its queue (queue mode
+                                       only) */
 } tiz_cast_client_media_status_t;
 
 /**
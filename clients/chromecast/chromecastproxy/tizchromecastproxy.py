@@ -25,8 +25,12 @@ Access a Chromecast device to initiate and manage audio streaming sessions..
 
 
 import select
+import socket
+import json
+import os
 import sys
 import logging
+import threading
 import unicodedata
 import pychromecast
 from pychromecast.controllers.media import (
@@ -44,12 +48,71 @@ from pychromecast.error import (
 from pychromecast.config import (
     APP_MEDIA_RECEIVER
 )
+try:
+    from pychromecast.discovery import discover_chromecasts
+except ImportError:
+    discover_chromecasts = None
+try:
+    from pychromecast.dial import get_device_status
+except ImportError:
+    get_device_status = None
+try:
+    from tizproxystats import (proxy_instrumentation, instrumented,
+                               InstrumentedBackend, DEFAULT_PROFILE_RATE)
+except ImportError:
+    # tizproxystats is installed with the proxy daemon; without it the proxy
+    # works as usual, but its calls are neither counted nor profiled
+    DEFAULT_PROFILE_RATE = 0.01
+
+    class _NoInstrumentation(object):
+        """ A stand-in for the statistics and profiler objects of
+        tizproxystats.
+
+        """
+        def record_cache(self, name, hit):
+            """ Ignore a cache lookup. """
+
+        def snapshot(self):
+            """ Return empty statistics. """
+            return {'calls': dict(), 'caches': dict()}
+
+        def configure(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+            """ Profiling is not available. """
+            logging.info("Profiling needs tizproxystats, not installed")
+
+    def proxy_instrumentation(proxy):
+        """ Return stand-ins for the proxy's statistics and profiler. """
+        return _NoInstrumentation(), _NoInstrumentation()
+
+    def instrumented(stats, profiler):
+        """ Return a class decorator that leaves the class unchanged. """
+        return lambda cls: cls
+
+    def InstrumentedBackend(backend, name, stats):
+        """ Return the backend itself, unwrapped. """
+        return backend
 
 # For use during debugging
 import pprint
 from traceback import print_exception
 
 DEFAULT_THUMB="https://avatars0.githubusercontent.com/u/3161606?v=3&s=400"
+
+# The devices found by previous discoveries are kept in this file
+DEVICE_CACHE_FILE = os.path.join(os.path.expanduser('~'),
+                                 '.config/tizonia/chromecast-devices.json')
+
+# Seconds to wait for a cached device address to accept a connection
+CACHED_ADDRESS_TIMEOUT = 0.5
+
+# Seconds to spend browsing for devices with mDNS
+DISCOVERY_TIMEOUT = 5
+
+DEFAULT_CAST_PORT = 8009
+
+# Seconds before the end of a queue item at which the receiver starts loading
+# the next one
+QUEUE_PRELOAD_TIME = 20
 FORMAT = '[%(asctime)s] [%(levelname)5s] [%(thread)d] ' \
          '[%(module)s:%(funcName)s:%(lineno)d] - %(message)s'
 
@@ -118,7 +181,164 @@ def to_ascii(msg):
 
     return unicodedata.normalize('NFKD', str(msg)).encode('ASCII', 'ignore')
 
+# The call statistics and profiler shared by the proxy objects in the process
+_STATS, _PROFILER = proxy_instrumentation('chromecast')
+
+# The known devices, keyed by friendly name. These are loaded from
+# DEVICE_CACHE_FILE and refreshed in the background by discover_devices.
+_DEVICES = dict()
+_DEVICES_LOCK = threading.Lock()
+_DISCOVERY = None
+
+def load_devices():
+    """ Load the known devices from the cache file.
+
+    """
+    try:
+        with open(DEVICE_CACHE_FILE, 'r') as f:
+            devices = json.load(f)
+    except (IOError, OSError, ValueError):
+        return
+    with _DEVICES_LOCK:
+        for name, device in devices.items():
+            _DEVICES.setdefault(name, device)
+
+def discover_devices():
+    """ Browse the network for devices, then update the list of known devices
+    and its cache file.
+
+    """
+    if not discover_chromecasts:
+        return
+    try:
+        found = discover_chromecasts(timeout=DISCOVERY_TIMEOUT)
+    except Exception as exception:
+        logging.info("Device discovery failed: %s", exception)
+        return
+    with _DEVICES_LOCK:
+        for host, port, uuid, model_name, friendly_name in found:
+            _DEVICES[friendly_name] = {'host': host,
+                                       'port': port or DEFAULT_CAST_PORT,
+                                       'uuid': str(uuid) if uuid else None,
+                                       'model_name': model_name}
+        devices = dict(_DEVICES)
+    try:
+        if not os.path.isdir(os.path.dirname(DEVICE_CACHE_FILE)):
+            os.makedirs(os.path.dirname(DEVICE_CACHE_FILE))
+        tmp_path = DEVICE_CACHE_FILE + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(devices, f, indent=2, sort_keys=True)
+        os.rename(tmp_path, DEVICE_CACHE_FILE)
+    except (IOError, OSError) as exception:
+        logging.info("Could not write %s: %s", DEVICE_CACHE_FILE, exception)
+
+def start_discovery():
+    """ Start a background discovery, unless there is one in progress, and
+    return its thread.
+
+    """
+    global _DISCOVERY
+    with _DEVICES_LOCK:
+        if not _DISCOVERY or not _DISCOVERY.is_alive():
+            _DISCOVERY = threading.Thread(target=discover_devices)
+            _DISCOVERY.daemon = True
+            _DISCOVERY.start()
+        return _DISCOVERY
+
+def known_devices():
+    """ Return the friendly names of the known devices.
+
+    """
+    with _DEVICES_LOCK:
+        return sorted(_DEVICES)
 
+def is_reachable(host, port, timeout=CACHED_ADDRESS_TIMEOUT):
+    """ Check whether a device accepts connections at an address.
+
+    """
+    try:
+        socket.create_connection((host, port), timeout).close()
+        return True
+    except (socket.error, socket.timeout):
+        return False
+
+def is_same_device(device):
+    """ Check whether the device answering at a cached address is the one that
+    was cached there, by comparing the uuid it reports with the cached one.
+
+    """
+    if not device.get('uuid'):
+        # Nothing to compare with
+        return True
+    if not get_device_status:
+        return False
+    try:
+        status = get_device_status(device['host'])
+    except Exception as exception:
+        logging.info("Could not identify %s: %s", device['host'], exception)
+        return False
+    uuid = str(status.uuid) if status and status.uuid else None
+    if uuid != device['uuid']:
+        logging.info("%s is now %s, not %s", device['host'], uuid,
+                     device['uuid'])
+        return False
+    return True
+
+def resolve_device(name_or_ip):
+    """ Return the cached (host, port) of a device given its friendly name,
+    or None if the device is unknown or unreachable, or if 'name_or_ip' is
+    already an IP address.
+
+    The cached address is tried first. Otherwise, or if it does not respond,
+    or a different device (by uuid) now answers there, the devices are looked
+    up again with mDNS.
+
+    """
+    for family in (socket.AF_INET, socket.AF_INET6):
+        try:
+            socket.inet_pton(family, name_or_ip)
+            return None
+        except (socket.error, ValueError):
+            pass
+    with _DEVICES_LOCK:
+        device = _DEVICES.get(name_or_ip)
+    hit = bool(device and is_reachable(device['host'], device['port'])
+               and is_same_device(device))
+    _STATS.record_cache('devices', hit)
+    if not hit:
+        if device:
+            # Forget the stale address, unless the lookup finds the device
+            # again
+            with _DEVICES_LOCK:
+                if _DEVICES.get(name_or_ip) is device:
+                    del _DEVICES[name_or_ip]
+        start_discovery().join()
+        with _DEVICES_LOCK:
+            device = _DEVICES.get(name_or_ip)
+        if not device:
+            return None
+    else:
+        # Keep the cache warm for the next time
+        start_discovery()
+    return device['host'], device['port']
+
+load_devices()
+
+def queue_item(url, content_type, title, thumb, stream_type):
+    """ Return a Cast media queue item.
+
+    """
+    return {'media': {'contentId': url,
+                      'contentType': content_type,
+                      'streamType': stream_type,
+                      'metadata': {'metadataType': 0,
+                                   'title': title,
+                                   'thumb': thumb,
+                                   'images': [{'url': thumb}]}},
+            'autoplay': True,
+            'preloadTime': QUEUE_PRELOAD_TIME}
+
+@instrumented(_STATS, _PROFILER)
 class tizchromecastproxy(object):
     """A class that interfaces with a Chromecast device to initiate and manage
     audio streaming sessions.
@@ -130,9 +350,35 @@ class tizchromecastproxy(object):
         self.cast = None
         self.cast_status_listener = None
         self.media_status_listener = None
+        self.queue_mode = False
+        self.queue_content_id = None
+
+    def get_stats(self):
+        """ Return the call counters, latency percentiles (in seconds) and cache
+        hit rates collected so far by all the proxy objects in the process.
+
+        """
+        return _STATS.snapshot()
+
+    def set_profiling(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+        """ Enable or disable (with an empty 'directory') the profiling of a
+        sample of the proxy commands. This affects all the proxy objects in the
+        process.
+
+        :param directory: where to write the cProfile and tracemalloc results
+        :param sample_rate: the fraction of commands to profile (0.0 - 1.0)
+
+        """
+        _PROFILER.configure(directory, sample_rate)
 
     def activate(self, cast_status_listener, media_status_listener):
-        self.cast = pychromecast.Chromecast(self.name_or_ip, blocking=False)
+        address = resolve_device(self.name_or_ip)
+        if address:
+            cast = pychromecast.Chromecast(address[0], port=address[1],
+                                           blocking=False)
+        else:
+            cast = pychromecast.Chromecast(self.name_or_ip, blocking=False)
+        self.cast = InstrumentedBackend(cast, 'pychromecast', _STATS)
         self.cast_status_listener = cast_status_listener
         self.media_status_listener = media_status_listener
         self.cast.register_status_listener(self)
@@ -162,6 +408,7 @@ class tizchromecastproxy(object):
         logging.info("proxy : Loading a new stream")
         mc = self.cast.media_controller
         st = mc.status
+        self.queue_mode = False
         try:
             if not thumb or thumb == '':
                 thum = DEFAULT_THUMB;
@@ -171,6 +418,82 @@ class tizchromecastproxy(object):
         except Exception as exception:
             print_err('Unable to load stream')
 
+    def media_queue_load(self, url, content_type, title=None,
+                         thumb=DEFAULT_THUMB,
+                         stream_type=STREAM_TYPE_BUFFERED):
+        """ Replace the current media with a new receiver-side queue that
+        starts with this stream.
+
+        The following streams are appended with media_queue_insert. The
+        receiver preloads each item before the previous one ends, and the
+        media status listener receives 'QUEUE_ITEM_CHANGED' every time it moves
+        on to the next item.
+
+        Raises if the request to launch the default media receiver fails, so
+        that the stream can be loaded with media_load instead.
+
+        """
+        print_nfo("[Chromecast] [{0}] [Loading queue]" \
+                  .format(to_ascii(self.name_or_ip)))
+        mc = self.cast.media_controller
+        item = queue_item(url, content_type, title,
+                          thumb or DEFAULT_THUMB, stream_type)
+
+        def app_launched_callback():
+            """ Send the queue once the default media receiver is running.
+
+            """
+            try:
+                mc.send_message({'type': 'QUEUE_LOAD',
+                                 'items': [item],
+                                 'startIndex': 0,
+                                 'repeatMode': 'REPEAT_OFF'})
+            except Exception as exception:
+                logging.info('Unable to load queue: %s', exception)
+                print_wrn('Unable to load queue; loading stream instead')
+                self.media_load(url, content_type, title, thumb,
+                                stream_type=stream_type)
+
+        self.queue_mode = True
+        self.queue_content_id = url
+        try:
+            # Like play_media, launch the default media receiver (a no-op if
+            # it is already running) and send the queue when it is ready
+            self.cast.socket_client.receiver_controller.launch_app(
+                mc.app_id, callback_function=app_launched_callback)
+        except Exception:
+            # Report the failure, so that the caller can use media_load
+            self.queue_mode = False
+            self.queue_content_id = None
+            print_err('Unable to load queue')
+            raise
+
+    def media_queue_insert(self, url, content_type, title=None,
+                           thumb=DEFAULT_THUMB,
+                           stream_type=STREAM_TYPE_BUFFERED):
+        """ Append a stream to the queue started with media_queue_load.
+
+        Raises RuntimeError if the receiver has no media session yet (i.e.
+        the queue has not been loaded).
+
+        """
+        logging.info("proxy : Appending a stream to the queue")
+        mc = self.cast.media_controller
+        session_id = mc.status.media_session_id if mc.status else None
+        if session_id is None:
+            print_err('Unable to append stream to queue: no media session')
+            raise RuntimeError('No media session to append the stream to')
+        try:
+            mc.send_message(
+                {'type': 'QUEUE_INSERT',
+                 'mediaSessionId': session_id,
+                 'items': [queue_item(url, content_type, title,
+                                      thumb or DEFAULT_THUMB, stream_type)]},
+                inc_session_id=True)
+        except Exception as exception:
+            print_err('Unable to append stream to queue')
+            raise
+
     def media_play(self):
         self.cast.media_controller.play()
 
@@ -251,6 +574,11 @@ class tizchromecastproxy(object):
         if status:
             logging.info("new_media_status: %r" % (status,))
             try:
+                if self.queue_mode and status.content_id \
+                   and status.content_id != self.queue_content_id:
+                    self.queue_content_id = status.content_id
+                    self.media_status_listener(to_ascii('QUEUE_ITEM_CHANGED'), \
+                                               status.volume_level)
                 self.media_status_listener(to_ascii(status.player_state), \
                                            status.volume_level)
             except Exception as exception:
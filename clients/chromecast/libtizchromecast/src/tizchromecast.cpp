@@ -38,13 +38,17 @@
 #include "tizchromecast.hpp"
 #include "tizchromecastctx.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
 
 /* This macro assumes the existence of an "tiz_chromecast_error_t rc" local
  * variable */
 #define try_catch_wrapper(expr)                                  \
   do                                                             \
     {                                                            \
+      const gil_guard gil;                                       \
       try                                                        \
         {                                                        \
           (expr);                                                \
@@ -95,6 +99,7 @@ tiz_chromecast_error_t tizchromecast::init ()
 tiz_chromecast_error_t tizchromecast::start ()
 {
   tiz_chromecast_error_t rc = ETizCcErrorNoError;
+  const gil_guard gil;
 
   bp::object &py_cc_proxy = cc_ctx_.create_cc_proxy (name_or_ip_);
 
@@ -158,6 +163,36 @@ tiz_chromecast_error_t tizchromecast::media_load (
   return rc;
 }
 
+tiz_chromecast_error_t tizchromecast::media_queue_load (
+    const std::string &url, const std::string &content_type,
+    const std::string &title, const std::string &album_art)
+{
+  tiz_chromecast_error_t rc = ETizCcErrorNoError;
+  if (cc_ctx_.cc_proxy_exists (name_or_ip_))
+    {
+      try_catch_wrapper (cc_ctx_.get_cc_proxy (name_or_ip_)
+                             .attr ("media_queue_load") (
+                                 bp::object (url), bp::object (content_type),
+                                 bp::object (title), bp::object (album_art)));
+    }
+  return rc;
+}
+
+tiz_chromecast_error_t tizchromecast::media_queue_insert (
+    const std::string &url, const std::string &content_type,
+    const std::string &title, const std::string &album_art)
+{
+  tiz_chromecast_error_t rc = ETizCcErrorNoError;
+  if (cc_ctx_.cc_proxy_exists (name_or_ip_))
+    {
+      try_catch_wrapper (cc_ctx_.get_cc_proxy (name_or_ip_)
+                             .attr ("media_queue_insert") (
+                                 bp::object (url), bp::object (content_type),
+                                 bp::object (title), bp::object (album_art)));
+    }
+  return rc;
+}
+
 tiz_chromecast_error_t tizchromecast::media_play ()
 {
   tiz_chromecast_error_t rc = ETizCcErrorNoError;
@@ -296,6 +331,11 @@ void tizchromecast::new_media_status (const std::string &status,
     {
       cbacks_.pf_media_status (p_user_data_, ETizCcMediaStatusPlaying, volume);
     }
+  else if (!status.compare ("QUEUE_ITEM_CHANGED"))
+    {
+      cbacks_.pf_media_status (p_user_data_,
+                               ETizCcMediaStatusQueueItemChanged, volume);
+    }
   else
     {
       assert (0);
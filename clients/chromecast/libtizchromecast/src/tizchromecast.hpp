@@ -89,6 +89,14 @@ public:
                                      const std::string &content_type,
                                      const std::string &title,
                                      const std::string &album_art);
+  tiz_chromecast_error_t media_queue_load (const std::string &url,
+                                           const std::string &content_type,
+                                           const std::string &title,
+                                           const std::string &album_art);
+  tiz_chromecast_error_t media_queue_insert (const std::string &url,
+                                             const std::string &content_type,
+                                             const std::string &title,
+                                             const std::string &album_art);
   tiz_chromecast_error_t media_play ();
   tiz_chromecast_error_t media_stop ();
   tiz_chromecast_error_t media_pause ();
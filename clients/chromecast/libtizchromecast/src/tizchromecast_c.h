@@ -110,6 +110,54 @@ tiz_chromecast_error_t tiz_chromecast_load_url (tiz_chromecast_t *ap_chromecast,
                                                 const char *ap_title,
                                                 const char *ap_album_art);
 
+/**
+ * Load a new audio stream URL as the first item of a new queue on the
+ * Chromecast device's default media application.
+ *
+ * Subsequent streams are appended to the queue with
+ * tiz_chromecast_queue_insert_url, and the device preloads each of them
+ * before the previous one finishes. Every time the device moves on to the
+ * next item, the media status callback is invoked with
+ * ETizCcMediaStatusQueueItemChanged.
+ *
+ * @ingroup libtizchromecast
+ *
+ * @param ap_chromecast The Tizonia Chromecast handle.
+ * @param ap_url The stream's URL.
+ * @param ap_content_type MIME content type of the stream being loaded.
+ * @param ap_title The title of the stream being loaded.
+ * @param ap_album_art The stream's album art URL.
+ *
+ * @return ETizCcErrorNoError on success, or ETizCcErrorConnectionError if
+ * the queue could not be loaded, in which case the stream may still be loaded
+ * with tiz_chromecast_load_url
+ */
+tiz_chromecast_error_t tiz_chromecast_queue_load_url (
+    tiz_chromecast_t *ap_chromecast, const char *ap_url,
+    const char *ap_content_type, const char *ap_title,
+    const char *ap_album_art);
+
+/**
+ * Append an audio stream URL to the queue started with
+ * tiz_chromecast_queue_load_url.
+ *
+ * @ingroup libtizchromecast
+ *
+ * @param ap_chromecast The Tizonia Chromecast handle.
+ * @param ap_url The stream's URL.
+ * @param ap_content_type MIME content type of the stream being queued.
+ * @param ap_title The title of the stream being queued.
+ * @param ap_album_art The stream's album art URL.
+ *
+ * @return ETizCcErrorNoError on success, ETizCcErrorConnectionError if the
+ * device has no media session yet (no queue has been loaded) or the request
+ * fails
+ */
+tiz_chromecast_error_t tiz_chromecast_queue_insert_url (
+    tiz_chromecast_t *ap_chromecast, const char *ap_url,
+    const char *ap_content_type, const char *ap_title,
+    const char *ap_album_art);
+
 /**
  * Resume media playback.
  *
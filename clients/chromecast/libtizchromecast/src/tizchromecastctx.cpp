@@ -37,11 +37,16 @@
 
 #include "tizchromecastctx.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
+using tiz::python::init_python;
 
 #define try_catch_wrapper(expr)                                  \
   do                                                             \
     {                                                            \
+      const gil_guard gil;                                       \
       try                                                        \
         {                                                        \
           (expr);                                                \
@@ -66,11 +71,6 @@ namespace
   void init_cc_ctx (bp::object &py_main, bp::object &py_global,
                     bp::object &py_chromecastproxy)
   {
-    if (!Py_IsInitialized ())
-      {
-        Py_Initialize ();
-      }
-
     // Import the Chromecast proxy module
     py_main = bp::import ("tizchromecastproxy");
 
@@ -83,16 +83,28 @@ namespace
 
 tizchromecastctx::tizchromecastctx ()
 {
+  init_python ();
   try_catch_wrapper (init_cc_ctx (py_main_, py_global_, py_chromecastproxy_));
 }
 
 tizchromecastctx::~tizchromecastctx ()
 {
   // boost::python doesn't support Py_Finalize() yet!
+
+  // Drop the references to the Python objects while holding the GIL
+  if (Py_IsInitialized ())
+    {
+      const gil_guard gil;
+      instances_.clear ();
+      py_chromecastproxy_ = bp::object ();
+      py_global_ = bp::object ();
+      py_main_ = bp::object ();
+    }
 }
 
 bp::object &tizchromecastctx::create_cc_proxy (const std::string &name_or_ip) const
 {
+  const gil_guard gil;
   if (instances_.count (name_or_ip))
     {
       instances_.erase (name_or_ip);
@@ -103,6 +115,7 @@ bp::object &tizchromecastctx::create_cc_proxy (const std::string &name_or_ip) co
 
 void tizchromecastctx::destroy_cc_proxy (const std::string &name_or_ip) const
 {
+  const gil_guard gil;
   if (instances_.count (name_or_ip))
     {
       instances_.erase (name_or_ip);
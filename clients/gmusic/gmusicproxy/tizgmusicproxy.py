@@ -36,12 +36,48 @@ import logging
 import random
 import unicodedata
 import pickle
+import threading
 from operator import itemgetter
 from gmusicapi import Mobileclient
 from gmusicapi.exceptions import CallFailure
 from requests.structures import CaseInsensitiveDict
 from fuzzywuzzy import process
 from fuzzywuzzy import fuzz
+try:
+    from tizproxystats import (proxy_instrumentation, instrumented,
+                               timed, DEFAULT_PROFILE_RATE)
+except ImportError:
+    # tizproxystats is installed with the proxy daemon; without it the proxy
+    # works as usual, but its calls are neither counted nor profiled
+    DEFAULT_PROFILE_RATE = 0.01
+
+    class _NoInstrumentation(object):
+        """ A stand-in for the statistics and profiler objects of
+        tizproxystats.
+
+        """
+        def record_cache(self, name, hit):
+            """ Ignore a cache lookup. """
+
+        def snapshot(self):
+            """ Return empty statistics. """
+            return {'calls': dict(), 'caches': dict()}
+
+        def configure(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+            """ Profiling is not available. """
+            logging.info("Profiling needs tizproxystats, not installed")
+
+    def proxy_instrumentation(proxy):
+        """ Return stand-ins for the proxy's statistics and profiler. """
+        return _NoInstrumentation(), _NoInstrumentation()
+
+    def instrumented(stats, profiler):
+        """ Return a class decorator that leaves the class unchanged. """
+        return lambda cls: cls
+
+    def timed(function, name, stats):
+        """ Return the function itself, unwrapped. """
+        return function
 
 # For use during debugging
 # from pprint import pprint
@@ -133,6 +169,164 @@ def to_ascii(msg):
         return unicodedata.normalize('NFKD', str(msg)).encode('ASCII', 'ignore')
     return msg
 
+# The call statistics and profiler shared by the proxy objects in the process
+_STATS, _PROFILER = proxy_instrumentation('gmusic')
+
+class _GMusicSession(object):
+    """A Mobileclient wrapper that starts optimistically with the cached auth
+    token.
+
+    The token is validated in a background thread, in parallel with the first
+    library or search request. If a call fails and the token turns out to be
+    stale, the session re-authenticates with the user credentials and retries
+    the failed call once.
+
+    """
+
+    def __init__(self, email, password, device_id, token_file):
+        self.__client = Mobileclient()
+        self.__email = email
+        self.__password = password
+        self.__device_id = device_id
+        self.__token_file = token_file
+        self.__lock = threading.Lock()
+        self.__validator = None
+        self.__token_stale = False
+        self.logged_in = False
+
+    def __getattr__(self, name):
+        attr = getattr(self.__client, name)
+        if not callable(attr):
+            return attr
+
+        def call_with_reauth(*args, **kwargs):
+            """ Invoke a Mobileclient method, re-authenticating on a stale
+            token.
+
+            """
+            if self.__token_stale:
+                self.__reauthenticate()
+            try:
+                return getattr(self.__client, name)(*args, **kwargs)
+            except CallFailure:
+                if not self.__reauthenticate():
+                    raise
+                return getattr(self.__client, name)(*args, **kwargs)
+
+        return timed(call_with_reauth, 'gmusicapi.' + name, _STATS)
+
+    def start(self):
+        """ Start the session with the cached auth token, if there is one, or
+        with the user credentials otherwise.
+
+        """
+        auth_token = ""
+        if os.path.isfile(self.__token_file):
+            with open(self.__token_file, "rb") as f:
+                auth_token = pickle.load(f)
+
+        if auth_token:
+            # 'Keep track of the auth token' workaround. See:
+            # https://github.com/diraimondo/gmusicproxy/issues/34#issuecomment-147359198
+            print_msg("[Google Play Music] [Authenticating] : " \
+                      "'with cached auth token'")
+            self.__client.android_id = self.__device_id
+            self.__client.session._authtoken = auth_token
+            self.__client.session.is_authenticated = True
+            self.logged_in = True
+            self.__validator = threading.Thread(target=self.__validate_token)
+            self.__validator.daemon = True
+            self.__validator.start()
+        else:
+            self.__login()
+
+    def __validate_token(self):
+        """ Check the cached auth token against the server (runs in the
+        background).
+
+        """
+        try:
+            self.__client.get_registered_devices()
+        except CallFailure:
+            print_wrn("[Google Play Music] [Authenticating] : " \
+                      "'auth token expired'")
+            self.__token_stale = True
+
+    def __reauthenticate(self):
+        """ Wait for the token validation to complete and log in again with the
+        user credentials if the cached token is stale.
+
+        Returns True if the session has been re-authenticated.
+
+        """
+        validator = self.__validator
+        if validator and validator is not threading.current_thread():
+            validator.join()
+        with self.__lock:
+            if not self.__token_stale:
+                return False
+            # The token has expired. Reset the client object
+            self.__client = Mobileclient()
+            self.__login()
+            self.__token_stale = False
+            return self.logged_in
+
+    def __login(self):
+        """ Log in with the user credentials and cache the new auth token.
+
+        """
+        attempts = 0
+        self.logged_in = False
+        print_nfo("[Google Play Music] [Authenticating] : " \
+                  "'with user credentials'")
+        while not self.logged_in and attempts < 3:
+            self.logged_in = self.__client.login(self.__email, self.__password,
+                                                 self.__device_id)
+            attempts += 1
+
+        if self.logged_in:
+            with open(self.__token_file, "wb") as f:
+                pickle.dump(self.__client.session._authtoken, f)
+
+# Sessions, keyed by account and device id, and the number of proxy objects
+# using each. These are shared by all the proxy objects in the process (e.g.
+# when hosted by the proxy daemon, tizproxyd).
+_SESSIONS = dict()
+_SESSIONS_LOCK = threading.Lock()
+
+def acquire_session(email, password, device_id, token_file):
+    """ Return a started session for an account, logging in if there is none
+    yet.
+
+    """
+    key = (email, device_id)
+    with _SESSIONS_LOCK:
+        session, users = _SESSIONS.get(key, (None, 0))
+        _STATS.record_cache('sessions', session is not None)
+        if session is None:
+            session = _GMusicSession(email, password, device_id, token_file)
+            session.start()
+            if not session.logged_in:
+                return session
+        _SESSIONS[key] = (session, users + 1)
+        return session
+
+def release_session(session):
+    """ Drop a reference to a session, and log out once it is no longer in
+    use.
+
+    """
+    with _SESSIONS_LOCK:
+        for key, (shared, users) in list(_SESSIONS.items()):
+            if shared is session:
+                if users > 1:
+                    _SESSIONS[key] = (shared, users - 1)
+                    return
+                del _SESSIONS[key]
+                break
+    session.logout()
+
+@instrumented(_STATS, _PROFILER)
 class tizgmusicproxy(object):
     """A class for logging into a Google Play Music account and retrieving song
     URLs.
@@ -144,10 +338,8 @@ class tizgmusicproxy(object):
 
     # pylint: disable=too-many-instance-attributes,too-many-public-methods
     def __init__(self, email, password, device_id):
-        self.__gmusic = Mobileclient()
         self.__email = email
         self.__device_id = device_id
-        self.logged_in = False
         self.queue = list()
         self.queue_index = -1
         self.play_queue_order = list()
@@ -157,49 +349,47 @@ class tizgmusicproxy(object):
 
         userdir = os.path.expanduser('~')
         tizconfig = os.path.join(userdir, ".config/tizonia/." + email + ".auth_token")
-        auth_token = ""
-        if os.path.isfile(tizconfig):
-            with open(tizconfig, "rb") as f:
-                auth_token = pickle.load(f)
-                if auth_token:
-                    # 'Keep track of the auth token' workaround. See:
-                    # https://github.com/diraimondo/gmusicproxy/issues/34#issuecomment-147359198
-                    print_msg("[Google Play Music] [Authenticating] : " \
-                              "'with cached auth token'")
-                    self.__gmusic.android_id = device_id
-                    self.__gmusic.session._authtoken = auth_token
-                    self.__gmusic.session.is_authenticated = True
-                    try:
-                        self.__gmusic.get_registered_devices()
-                    except CallFailure:
-                        # The token has expired. Reset the client object
-                        print_wrn("[Google Play Music] [Authenticating] : " \
-                                  "'auth token expired'")
-                        self.__gmusic = Mobileclient()
-                        auth_token = ""
-
-        if not auth_token:
-            attempts = 0
-            print_nfo("[Google Play Music] [Authenticating] : " \
-                      "'with user credentials'")
-            while not self.logged_in and attempts < 3:
-                self.logged_in = self.__gmusic.login(email, password, device_id)
-                attempts += 1
-
-            with open(tizconfig, "ab+") as f:
-                f.truncate()
-                pickle.dump(self.__gmusic.session._authtoken, f)
+        self.__gmusic = acquire_session(email, password, device_id, tizconfig)
+        self.__session_released = False
 
         self.library = CaseInsensitiveDict()
         self.song_map = CaseInsensitiveDict()
         self.playlists = CaseInsensitiveDict()
         self.stations = CaseInsensitiveDict()
 
+    @property
+    def logged_in(self):
+        """ Whether the shared session is currently logged in.
+
+        """
+        return self.__gmusic.logged_in
+
+    def get_stats(self):
+        """ Return the call counters, latency percentiles (in seconds) and cache
+        hit rates collected so far by all the proxy objects in the process.
+
+        """
+        return _STATS.snapshot()
+
+    def set_profiling(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+        """ Enable or disable (with an empty 'directory') the profiling of a
+        sample of the proxy commands. This affects all the proxy objects in the
+        process.
+
+        :param directory: where to write the cProfile and tracemalloc results
+        :param sample_rate: the fraction of commands to profile (0.0 - 1.0)
+
+        """
+        _PROFILER.configure(directory, sample_rate)
+
     def logout(self):
-        """ Reset the session to an unauthenticated, default state.
+        """ Reset the session to an unauthenticated, default state. Only the
+        first call has any effect, so that the shared session is released once.
 
         """
-        self.__gmusic.logout()
+        if not self.__session_released:
+            self.__session_released = True
+            release_session(self.__gmusic)
 
     def set_play_mode(self, mode):
         """ Set the playback mode.
@@ -29,17 +29,25 @@
 #include <config.h>
 #endif
 
+#include <stdlib.h>
+
 #include <iostream>
 #include <boost/lexical_cast.hpp>
 
 #include "tizgmusic.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
+using tiz::python::import_proxy_module;
+using tiz::python::init_python;
 
 /* This macro assumes the existence of an "int rc" local variable */
 #define try_catch_wrapper(expr)                                  \
   do                                                             \
     {                                                            \
+      const gil_guard gil;                                       \
       try                                                        \
         {                                                        \
           if (!rc)                                               \
@@ -70,7 +78,8 @@ namespace
   int check_deps ()
   {
     int rc = 1;
-    Py_Initialize ();
+    init_python ();
+    const gil_guard gil;
 
     try
       {
@@ -114,7 +123,7 @@ namespace
                     boost::python::object &py_global)
   {
     // Import the Google Play Music proxy module
-    py_main = bp::import ("tizgmusicproxy");
+    py_main = import_proxy_module ("tizgmusicproxy");
 
     // Retrieve the main module's namespace
     py_global = py_main.attr ("__dict__");
@@ -139,6 +148,14 @@ tizgmusic::tizgmusic (const std::string &user, const std::string &pass,
 
 tizgmusic::~tizgmusic ()
 {
+  // Drop the references to the Python objects while holding the GIL
+  if (Py_IsInitialized ())
+    {
+      const gil_guard gil;
+      py_gm_proxy_ = bp::object ();
+      py_global_ = bp::object ();
+      py_main_ = bp::object ();
+    }
 }
 
 int tizgmusic::init ()
@@ -284,6 +301,7 @@ int tizgmusic::play_promoted_tracks ()
 
 const char *tizgmusic::get_next_url ()
 {
+  const gil_guard gil;
   current_url_.clear ();
   try
     {
@@ -303,6 +321,7 @@ const char *tizgmusic::get_next_url ()
 
 const char *tizgmusic::get_prev_url ()
 {
+  const gil_guard gil;
   current_url_.clear ();
   try
     {
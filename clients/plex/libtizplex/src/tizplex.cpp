@@ -30,16 +30,24 @@
 #endif
 
 #include <boost/lexical_cast.hpp>
+#include <stdlib.h>
+
 #include <iostream>
 
 #include "tizplex.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
+using tiz::python::import_proxy_module;
+using tiz::python::init_python;
 
 /* This macro assumes the existence of an "int rc" local variable */
 #define try_catch_wrapper(expr)                                  \
   do                                                             \
     {                                                            \
+      const gil_guard gil;                                       \
       try                                                        \
         {                                                        \
           if (!rc)                                               \
@@ -70,7 +78,8 @@ namespace
   int check_deps ()
   {
     int rc = 1;
-    Py_Initialize ();
+    init_python ();
+    const gil_guard gil;
 
     try
       {
@@ -114,7 +123,7 @@ namespace
                   boost::python::object &py_global)
   {
     // Import the Plex proxy module
-    py_main = bp::import ("tizplexproxy");
+    py_main = import_proxy_module ("tizplexproxy");
 
     // Retrieve the main module's namespace
     py_global = py_main.attr ("__dict__");
@@ -155,6 +164,14 @@ tizplex::tizplex (const std::string &base_url, const std::string &auth_token,
 
 tizplex::~tizplex ()
 {
+  // Drop the references to the Python objects while holding the GIL
+  if (Py_IsInitialized ())
+    {
+      const gil_guard gil;
+      py_plex_proxy_ = bp::object ();
+      py_global_ = bp::object ();
+      py_main_ = bp::object ();
+    }
 }
 
 int tizplex::init ()
@@ -221,6 +238,7 @@ int tizplex::play_audio_playlist (const std::string &playlist)
 
 const char *tizplex::get_next_url (const bool a_remove_current_url)
 {
+  const gil_guard gil;
   current_url_.clear ();
   try
     {
@@ -244,6 +262,7 @@ const char *tizplex::get_next_url (const bool a_remove_current_url)
 
 const char *tizplex::get_prev_url (const bool a_remove_current_url)
 {
+  const gil_guard gil;
   current_url_.clear ();
   try
     {
@@ -314,6 +333,18 @@ void tizplex::set_playback_mode (const playback_mode mode)
   (void)rc;
 }
 
+int tizplex::set_stream_profile (const int max_bitrate, const char *ap_codec,
+                                 const char *ap_direct_play)
+{
+  int rc = 0;
+  // NULL strings are passed as None, which selects the proxy's defaults
+  try_catch_wrapper (py_plex_proxy_.attr ("set_stream_profile") (
+      bp::object (max_bitrate),
+      ap_codec ? bp::object (ap_codec) : bp::object (),
+      ap_direct_play ? bp::object (ap_direct_play) : bp::object ()));
+  return rc;
+}
+
 const char *tizplex::get_current_audio_track_title ()
 {
   return current_track_title_.empty () ? NULL : current_track_title_.c_str ();
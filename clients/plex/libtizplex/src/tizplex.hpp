@@ -62,6 +62,8 @@ public:
   int play_audio_playlist (const std::string &playlist);
 
   void set_playback_mode (const playback_mode mode);
+  int set_stream_profile (const int max_bitrate, const char *ap_codec,
+                          const char *ap_direct_play);
   void clear_queue ();
   const char *get_current_audio_track_index ();
   const char *get_current_queue_length ();
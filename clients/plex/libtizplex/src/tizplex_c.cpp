@@ -141,6 +141,17 @@ extern "C" void tiz_plex_set_playback_mode (tiz_plex_t *ap_plex,
       static_cast< tizplex::playback_mode > (mode));
 }
 
+extern "C" int tiz_plex_set_stream_profile (tiz_plex_t *ap_plex,
+                                            const int a_max_bitrate,
+                                            const char *ap_codec,
+                                            const char *ap_direct_play)
+{
+  assert (ap_plex);
+  assert (ap_plex->p_proxy_);
+  return ap_plex->p_proxy_->set_stream_profile (a_max_bitrate, ap_codec,
+                                                ap_direct_play);
+}
+
 extern "C" int tiz_plex_play_audio_tracks (tiz_plex_t *ap_plex,
                                            const char *ap_tracks)
 {
@@ -125,6 +125,29 @@ const char *tiz_plex_get_current_queue_progress (tiz_plex_t *ap_plex);
 void tiz_plex_set_playback_mode (tiz_plex_t *ap_plex,
                                  const tiz_plex_playback_mode_t mode);
 
+/**
+ * Change the way the tracks are streamed, from the next track onwards.
+ *
+ * By default, the stream profile is configured from the
+ * TIZONIA_PLEXPROXY_MAX_BITRATE, TIZONIA_PLEXPROXY_CODEC and
+ * TIZONIA_PLEXPROXY_DIRECT_PLAY environment variables.
+ *
+ * @ingroup libtizplex
+ *
+ * @param ap_plex The tiz_plex handle.
+ * @param a_max_bitrate The maximum bitrate in kbps (0 for no limit).
+ * @param ap_codec The codec to transcode to ("mp3", "aac", "opus" or
+ * "vorbis"), or NULL for the default.
+ * @param ap_direct_play "auto" (transcode the tracks above the maximum
+ * bitrate), "always" or "never", or NULL for "auto".
+ *
+ * @return 0 on success, or 1 if the profile is not valid, in which case the
+ * current profile is kept
+ */
+int tiz_plex_set_stream_profile (tiz_plex_t *ap_plex, const int a_max_bitrate,
+                                 const char *ap_codec,
+                                 const char *ap_direct_play);
+
 /**
  * Add a Plex audio stream to the playback queue.
  *
@@ -25,15 +25,61 @@ Access Plex servers to retrieve audio track URLs and create a playback queue.
 
 import sys
 import os
+import json
 import logging
+import time
 import random
 import unicodedata
 import re
+import sqlite3
+import threading
+import uuid
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
 from plexapi.exceptions import NotFound
 from plexapi.myplex import MyPlexAccount
 from plexapi.server import PlexServer
+from requests.exceptions import ConnectionError as RequestsConnectionError
+from requests.exceptions import Timeout
 from fuzzywuzzy import process
 from fuzzywuzzy import fuzz
+try:
+    from tizproxystats import (proxy_instrumentation, instrumented,
+                               InstrumentedBackend, DEFAULT_PROFILE_RATE)
+except ImportError:
+    # tizproxystats is installed with the proxy daemon; without it the proxy
+    # works as usual, but its calls are neither counted nor profiled
+    DEFAULT_PROFILE_RATE = 0.01
+
+    class _NoInstrumentation(object):
+        """ A stand-in for the statistics and profiler objects of
+        tizproxystats.
+
+        """
+        def record_cache(self, name, hit):
+            """ Ignore a cache lookup. """
+
+        def snapshot(self):
+            """ Return empty statistics. """
+            return {'calls': dict(), 'caches': dict()}
+
+        def configure(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+            """ Profiling is not available. """
+            logging.info("Profiling needs tizproxystats, not installed")
+
+    def proxy_instrumentation(proxy):
+        """ Return stand-ins for the proxy's statistics and profiler. """
+        return _NoInstrumentation(), _NoInstrumentation()
+
+    def instrumented(stats, profiler):
+        """ Return a class decorator that leaves the class unchanged. """
+        return lambda cls: cls
+
+    def InstrumentedBackend(backend, name, stats):
+        """ Return the backend itself, unwrapped. """
+        return backend
 import imp
 
 if sys.version[0] == '2':
@@ -43,6 +89,43 @@ if sys.version[0] == '2':
 # For use during debugging
 # import pprint
 
+# The published connections of the servers used before, and the fastest one
+# of each, are kept in this file
+CONNECTION_CACHE_FILE = os.path.join(os.path.expanduser('~'),
+                                     '.config/tizonia/plex-connections.json')
+
+# Seconds to wait for the connection chosen previously to respond, and for
+# any of the connections of a server to respond
+CACHED_CONNECTION_TIMEOUT = 1
+CONNECTION_TIMEOUT = 5
+
+# The codecs the tracks may be transcoded to, and their containers
+TRANSCODE_CONTAINERS = {'mp3': 'mp3', 'aac': 'aac', 'opus': 'ogg',
+                        'vorbis': 'ogg'}
+DEFAULT_TRANSCODE_CODEC = 'mp3'
+
+# Bitrate (kbps) of the transcoded tracks when no maximum bitrate is set
+DEFAULT_TRANSCODE_BITRATE = 320
+
+# Number of playlist items retrieved per request
+PLAYLIST_PAGE_SIZE = 200
+
+# Maximum number of items retrieved with a single metadata request
+METADATA_BATCH = 100
+
+# Seconds between incremental, and full, refreshes of the section mirror
+MIRROR_SYNC_INTERVAL = 10 * 60
+MIRROR_FULL_SYNC_INTERVAL = 24 * 60 * 60
+
+# Number of items retrieved per request while refreshing the section mirror
+MIRROR_PAGE_SIZE = 5000
+
+# Maximum number of tracks queued from a track search in the section mirror
+MIRROR_MAX_TRACKS = 100
+
+# The Plex metadata types of the mirrored items
+MIRROR_TYPES = {'artist': 8, 'album': 9, 'track': 10}
+
 FORMAT = '[%(asctime)s] [%(levelname)5s] [%(thread)d] ' \
          '[%(module)s:%(funcName)s:%(lineno)d] - %(message)s'
 
@@ -128,18 +211,30 @@ def to_ascii(msg):
         return unicodedata.normalize('NFKD', str(msg)).encode('ASCII', 'ignore')
     return msg
 
+# The call statistics and profiler shared by the proxy objects in the process
+_STATS, _PROFILER = proxy_instrumentation('plex')
+
 class TrackInfo(object):
     """ Class that represents a Plex track in the queue.
 
     """
 
-    def __init__(self, track, artist, album):
-        """ class members. """
+    def __init__(self, track, artist=None, album=None):
+        """ class members.
+
+        When the artist or the album are not given, the track's grandparent
+        and parent fields are used instead, which avoids retrieving them from
+        the server.
+
+        """
         self.title = track.title
-        self.artist = artist.title
-        self.album = album.title
-        self.year = album.year if album.year else 0;
+        self.base_url = track._server._baseurl
+        self.artist = artist.title if artist else track.grandparentTitle
+        self.album = album.title if album else track.parentTitle
+        year = album.year if album else track.year
+        self.year = year if year else 0;
         self.duration = track.duration / 1000 if track.duration else 0;
+        self.key = track.key
         self.url = track.getStreamURL()
         self.thumb_url = track.thumbUrl
         self.art_url = track.artUrl
@@ -151,6 +246,483 @@ class TrackInfo(object):
             part = media.parts[0]
             self.size = part.size if part else 0
 
+# Plex servers, keyed by url and token, and their music sections. These are
+# shared by all the proxy objects in the process (e.g. when hosted by the proxy
+# daemon, tizproxyd).
+_SERVERS = dict()
+_SECTIONS = dict()
+_SERVERS_LOCK = threading.Lock()
+
+# The published connections of the servers, keyed by the url they are
+# configured with, and the fastest connection found for each. These are
+# loaded from CONNECTION_CACHE_FILE.
+_CONNECTIONS = None
+_CONNECTIONS_LOCK = threading.Lock()
+
+def known_connections(base_url):
+    """ Return the known connections of a server ('urls') and the fastest one
+    ('chosen'), if any.
+
+    """
+    global _CONNECTIONS
+    with _CONNECTIONS_LOCK:
+        if _CONNECTIONS is None:
+            try:
+                with open(CONNECTION_CACHE_FILE, 'r') as f:
+                    _CONNECTIONS = json.load(f)
+            except (IOError, OSError, ValueError):
+                _CONNECTIONS = dict()
+        return dict(_CONNECTIONS.get(base_url, {}))
+
+def update_connections(base_url, **entry):
+    """ Update the known connections of a server, and their cache file.
+
+    """
+    with _CONNECTIONS_LOCK:
+        _CONNECTIONS.setdefault(base_url, {}).update(entry)
+        try:
+            if not os.path.isdir(os.path.dirname(CONNECTION_CACHE_FILE)):
+                os.makedirs(os.path.dirname(CONNECTION_CACHE_FILE))
+            tmp_path = CONNECTION_CACHE_FILE + '.tmp'
+            with open(tmp_path, 'w') as f:
+                json.dump(_CONNECTIONS, f, indent=2, sort_keys=True)
+            os.rename(tmp_path, CONNECTION_CACHE_FILE)
+        except (IOError, OSError) as exception:
+            logging.info("Could not write %s: %s", CONNECTION_CACHE_FILE,
+                         exception)
+
+def discover_connections(base_url, token, server):
+    """ Retrieve from plex.tv the connections (local, remote and relay)
+    published by a server, and add them to the known connections.
+
+    """
+    try:
+        for resource in MyPlexAccount(token=token).resources():
+            if resource.clientIdentifier == server.machineIdentifier:
+                connections = sorted(resource.connections,
+                                     key=lambda c: not c.local)
+                urls = [c.uri for c in connections] \
+                       + [c.httpuri for c in connections if c.local]
+                # Race them all the next time the server is connected to
+                update_connections(base_url, urls=urls, chosen=None)
+                return
+    except Exception as exception:
+        logging.info("Could not discover the connections of %s: %s",
+                     base_url, exception)
+
+def fastest_connection(urls, token, timeout):
+    """ Connect to several urls of a server at once, and return the PlexServer
+    of the first one to respond (None if none does within 'timeout' seconds).
+
+    """
+    if not urls:
+        return None
+    result = dict()
+    pending = [len(urls)]
+    lock = threading.Lock()
+    answered = threading.Event()
+
+    def connect(url):
+        """ Try a single connection.
+
+        """
+        start = time.time()
+        try:
+            server = PlexServer(url, token, timeout=timeout)
+        except Exception as exception:
+            logging.info("%s: %s", url, exception)
+            server = None
+        with lock:
+            pending[0] -= 1
+            if server and 'server' not in result:
+                logging.info("%s responded in %.3f s", url, time.time() - start)
+                result['server'] = server
+            if server or not pending[0]:
+                answered.set()
+
+    for url in urls:
+        thread = threading.Thread(target=connect, args=(url,))
+        thread.daemon = True
+        thread.start()
+    answered.wait(timeout)
+    return result.get('server')
+
+def connect_server(base_url, token, failed=None):
+    """ Connect to a server through the fastest of its connections.
+
+    The connection chosen last time is tried first. If it does not respond, or
+    it is the one that has just 'failed', all the known connections of the
+    server are raced, and the first one to respond is chosen.
+
+    """
+    entry = known_connections(base_url)
+    chosen = entry.get('chosen')
+    server = None
+    if chosen and chosen != failed:
+        server = fastest_connection([chosen], token, CACHED_CONNECTION_TIMEOUT)
+    if server is None:
+        urls = [url for url in entry.get('urls', []) + [base_url]
+                if url != failed]
+        server = fastest_connection(sorted(set(urls), key=urls.index), token,
+                                    CONNECTION_TIMEOUT)
+    if server is None:
+        # Report the error of the configured url
+        server = PlexServer(base_url, token)
+    if server._baseurl != chosen:
+        update_connections(base_url, chosen=server._baseurl)
+    print_nfo("[Plex] [Connection] '{0}'.".format(to_ascii(server._baseurl)))
+    if 'urls' not in entry:
+        thread = threading.Thread(target=discover_connections,
+                                  args=(base_url, token, server))
+        thread.daemon = True
+        thread.start()
+    return server
+
+def shared_music_section(base_url, token, section, failed=None):
+    """ Return the Plex server and music section for a url, token and
+    section name, connecting to the server if needed.
+
+    If a 'failed' connection url is given, the server is connected to again,
+    through another of its connections if possible.
+
+    """
+    with _SERVERS_LOCK:
+        server = _SERVERS.get((base_url, token))
+        if server is not None and failed and server._baseurl == failed:
+            server = None
+            _SECTIONS.pop((base_url, token, section), None)
+        _STATS.record_cache('servers', server is not None)
+        if server is None:
+            server = connect_server(base_url, token, failed)
+            _SERVERS[(base_url, token)] = server
+        music = _SECTIONS.get((base_url, token, section))
+        _STATS.record_cache('sections', music is not None)
+        if music is None:
+            music = server.library.section(section)
+            _SECTIONS[(base_url, token, section)] = music
+        return server, music
+
+class SectionMirror(object):
+    """ A local copy, in a SQLite database, of the names of the artists, albums,
+    tracks and playlists of a music section.
+
+    Names are resolved against the mirror, with a full-text index when SQLite
+    supports FTS5, so that the whole section does not have to be listed for
+    each search. The mirror is refreshed in the background: incrementally,
+    with the items updated since the previous refresh, every
+    MIRROR_SYNC_INTERVAL seconds, and fully (to forget the items deleted from
+    the server) every MIRROR_FULL_SYNC_INTERVAL seconds.
+
+    """
+
+    def __init__(self, path, server, music):
+        self.path = path
+        self.server = server
+        self.__section_key = music.key
+        self.__lock = threading.Lock()
+        self.__refresh_thread = None
+        self.__db = sqlite3.connect(path, check_same_thread=False)
+        self.__db.execute('CREATE TABLE IF NOT EXISTS items ('
+                          'rating_key INTEGER PRIMARY KEY, kind TEXT, '
+                          'title TEXT, artist TEXT, album TEXT, year INTEGER, '
+                          'updated_at INTEGER)')
+        self.__db.execute('CREATE TABLE IF NOT EXISTS sync ('
+                          'name TEXT PRIMARY KEY, time INTEGER)')
+        try:
+            self.__db.execute('CREATE VIRTUAL TABLE IF NOT EXISTS items_fts '
+                              'USING fts5(title)')
+            self.fts = True
+        except sqlite3.OperationalError:
+            logging.info("FTS5 not available; using plain name matching")
+            self.fts = False
+        self.__db.commit()
+
+    def search(self, kind, text, limit=1):
+        """ Return up to 'limit' (rating key, title) tuples of the items of a
+        kind ('artist', 'album', 'track' or 'playlist') whose titles contain
+        all the words in 'text', best matches first.
+
+        """
+        self.refresh()
+        words = re.findall(r'\w+', text, re.UNICODE)
+        if not words:
+            return list()
+        with self.__lock:
+            if self.fts:
+                query = 'title : ({0})'.format(
+                    ' '.join('"{0}"*'.format(word) for word in words))
+                rows = self.__db.execute(
+                    'SELECT items.rating_key, items.title FROM items_fts '
+                    'JOIN items ON items.rating_key = items_fts.rowid '
+                    'WHERE items_fts MATCH ? AND items.kind = ? '
+                    'ORDER BY items_fts.rank LIMIT ?',
+                    (query, kind, limit)).fetchall()
+            else:
+                rows = self.__db.execute(
+                    'SELECT rating_key, title FROM items WHERE kind = ? AND '
+                    + ' AND '.join(['title LIKE ?'] * len(words))
+                    + ' ORDER BY length(title) LIMIT ?',
+                    [kind] + ['%{0}%'.format(word) for word in words]
+                    + [limit]).fetchall()
+        _STATS.record_cache('mirror', bool(rows))
+        return rows
+
+    def titles(self, kind):
+        """ Return a dictionary with the rating keys of all the mirrored items
+        of a kind, keyed by title.
+
+        """
+        self.refresh()
+        with self.__lock:
+            return dict((title, rating_key) for rating_key, title in
+                        self.__db.execute('SELECT rating_key, title FROM items '
+                                          'WHERE kind = ?', (kind,)))
+
+    def forget(self, rating_key):
+        """ Remove an item that no longer exists in the server.
+
+        """
+        with self.__lock:
+            self.__delete([rating_key])
+            self.__db.commit()
+
+    def refresh(self):
+        """ Start a background refresh, if one is due and none is in
+        progress.
+
+        """
+        with self.__lock:
+            if self.__refresh_thread and self.__refresh_thread.is_alive():
+                return
+            if time.time() - self.__sync_time('last') < MIRROR_SYNC_INTERVAL:
+                return
+            self.__refresh_thread = threading.Thread(target=self.__refresh)
+            self.__refresh_thread.daemon = True
+            self.__refresh_thread.start()
+
+    def __refresh(self):
+        """ Bring the mirror up to date with the server.
+
+        """
+        started = int(time.time())
+        with self.__lock:
+            full = started - self.__sync_time('full') >= MIRROR_FULL_SYNC_INTERVAL
+            # Allow for some clock skew between the server and this host
+            since = 0 if full else max(self.__sync_time('last') - 60, 0)
+        try:
+            for kind, libtype in MIRROR_TYPES.items():
+                key = '/library/sections/{0}/all?type={1}'.format(
+                    self.__section_key, libtype)
+                if since:
+                    key += '&updatedAt%3E%3E={0}'.format(since)
+                self.__update(kind, self.__fetch(key), full)
+            self.__update('playlist',
+                          self.__fetch('/playlists?playlistType=audio'), True)
+        except Exception as exception:
+            logging.info("Could not refresh %s: %s", self.path, exception)
+            return
+        with self.__lock:
+            self.__set_sync_time('last', started)
+            if full:
+                self.__set_sync_time('full', started)
+            self.__db.commit()
+        print_nfo("[Plex] [Section mirror] '{0}' updated." \
+                  .format(to_ascii(self.path)))
+
+    def __fetch(self, key):
+        """ Retrieve the attributes of all the items in a listing, one page at
+        a time.
+
+        """
+        items = list()
+        start = 0
+        while True:
+            data = self.server.query(
+                '{0}{1}X-Plex-Container-Start={2}&X-Plex-Container-Size={3}' \
+                .format(key, '&' if '?' in key else '?', start,
+                        MIRROR_PAGE_SIZE))
+            page = [elem.attrib for elem in data] if data is not None else []
+            items.extend(page)
+            if len(page) < MIRROR_PAGE_SIZE:
+                return items
+            start += len(page)
+
+    def __update(self, kind, items, full):
+        """ Store the items of a kind; on a full update, also forget those
+        that are no longer in the server.
+
+        """
+        with self.__lock:
+            rows = [(int(item['ratingKey']), kind, item.get('title', ''),
+                     item.get('grandparentTitle') or item.get('parentTitle', ''),
+                     item.get('parentTitle', '') if kind == 'track' else '',
+                     int(item.get('year') or item.get('parentYear') or 0),
+                     int(item.get('updatedAt') or 0))
+                    for item in items if item.get('ratingKey')]
+            if full:
+                current = set(row[0] for row in rows)
+                self.__delete([key for (key,) in self.__db.execute(
+                    'SELECT rating_key FROM items WHERE kind = ?', (kind,))
+                               if key not in current])
+            self.__delete([row[0] for row in rows])
+            self.__db.executemany('INSERT INTO items VALUES (?, ?, ?, ?, ?, ?, ?)',
+                                  rows)
+            if self.fts:
+                self.__db.executemany('INSERT INTO items_fts (rowid, title) '
+                                      'VALUES (?, ?)',
+                                      [(row[0], row[2]) for row in rows])
+            self.__db.commit()
+
+    def __delete(self, rating_keys):
+        """ Remove items from the mirror.
+
+        """
+        keys = [(key,) for key in rating_keys]
+        self.__db.executemany('DELETE FROM items WHERE rating_key = ?', keys)
+        if self.fts:
+            self.__db.executemany('DELETE FROM items_fts WHERE rowid = ?', keys)
+
+    def __sync_time(self, name):
+        """ Return the time of the last refresh of a type ('last' or
+        'full').
+
+        """
+        row = self.__db.execute('SELECT time FROM sync WHERE name = ?',
+                                (name,)).fetchone()
+        return row[0] if row else 0
+
+    def __set_sync_time(self, name, value):
+        """ Record the time of a refresh.
+
+        """
+        self.__db.execute('INSERT OR REPLACE INTO sync VALUES (?, ?)',
+                          (name, value))
+
+# The section mirrors, keyed by database path, shared by all the proxy objects
+# in the process
+_MIRRORS = dict()
+
+def shared_section_mirror(directory, server, music):
+    """ Return the mirror of a music section, kept in 'directory'.
+
+    """
+    path = os.path.join(directory, 'plex-{0}-{1}.db' \
+                        .format(server.machineIdentifier, music.key))
+    with _SERVERS_LOCK:
+        mirror = _MIRRORS.get(path)
+        if mirror is None:
+            if not os.path.isdir(directory):
+                os.makedirs(directory)
+            mirror = SectionMirror(path, server, music)
+            _MIRRORS[path] = mirror
+        mirror.server = server
+        return mirror
+
+class StreamProfile(object):
+    """ Decide whether the tracks are played directly or transcoded, and
+    generate their transcode urls.
+
+    The direct play rule is one of:
+      - 'auto': transcode the tracks whose bitrate exceeds the maximum bitrate
+      - 'always': never transcode
+      - 'never': transcode every track, to the profile's codec and bitrate
+
+    """
+
+    def __init__(self, max_bitrate=0, codec=DEFAULT_TRANSCODE_CODEC,
+                 direct_play='auto'):
+        self.max_bitrate = 0
+        self.codec = DEFAULT_TRANSCODE_CODEC
+        self.direct_play = 'auto'
+        self.session = uuid.uuid4().hex
+        self.configure(max_bitrate, codec, direct_play)
+
+    def configure(self, max_bitrate, codec, direct_play):
+        """ Change the profile.
+
+        :param max_bitrate: the maximum bitrate in kbps (0 for no limit)
+        :param codec: the codec to transcode to (mp3, aac, opus or vorbis)
+        :param direct_play: 'auto', 'always' or 'never'
+
+        """
+        codec = (codec or DEFAULT_TRANSCODE_CODEC).strip().lower()
+        if codec not in TRANSCODE_CONTAINERS:
+            raise ValueError(str("Unsupported codec : %s" % codec))
+        direct_play = (direct_play or 'auto').strip().lower()
+        if direct_play not in ('auto', 'always', 'never'):
+            raise ValueError(str("Unknown direct play rule : %s" % direct_play))
+        self.max_bitrate = int(max_bitrate or 0)
+        self.codec = codec
+        self.direct_play = direct_play
+
+    def transcodes(self, track):
+        """ Return True if a track (a TrackInfo object) is to be transcoded.
+
+        """
+        if self.direct_play == 'always':
+            return False
+        if self.direct_play == 'never':
+            return True
+        return bool(self.max_bitrate and track.bitrate > self.max_bitrate)
+
+    def stream(self, track, base_url, token):
+        """ Return the url of a track, and the bitrate (kbps) and codec of the
+        audio delivered through it.
+
+        """
+        if not self.transcodes(track):
+            return track.url, track.bitrate, track.codec
+        bitrate = self.max_bitrate \
+                  or min(track.bitrate or DEFAULT_TRANSCODE_BITRATE,
+                         DEFAULT_TRANSCODE_BITRATE)
+        params = [('path', track.key),
+                  ('mediaIndex', 0),
+                  ('partIndex', 0),
+                  ('offset', 0),
+                  ('protocol', 'http'),
+                  ('directPlay', 0),
+                  ('directStream', 0),
+                  ('session', self.session),
+                  ('X-Plex-Platform', 'Chrome'),
+                  ('X-Plex-Client-Profile-Extra',
+                   'add-transcode-target(type=musicProfile&context=streaming'
+                   '&protocol=http&container={0}&audioCodec={1})' \
+                   .format(TRANSCODE_CONTAINERS[self.codec], self.codec)),
+                  ('X-Plex-Token', token)]
+        params[-1:-1] = [('maxAudioBitrate', bitrate),
+                         ('musicBitrate', bitrate)]
+        url = '{0}/music/:/transcode/universal/start.{1}?{2}' \
+              .format(base_url, TRANSCODE_CONTAINERS[self.codec],
+                      urlencode(params))
+        return url, bitrate, self.codec
+
+def reconnecting(method):
+    """ Wrap a proxy method so that, if the server cannot be reached, the proxy
+    connects to it again, through another connection if possible, and the call
+    is retried once.
+
+    """
+    def wrapper(self, *args, **kwargs):
+        """ Call the method, reconnecting on a connection error. """
+        queued = len(self.queue)
+        try:
+            return method(self, *args, **kwargs)
+        except (RequestsConnectionError, Timeout) as exception:
+            logging.info("%s: %s", method.__name__, exception)
+            # Drop the tracks queued by the failed call, as the retry queues
+            # them again
+            del self.queue[queued:]
+            self.play_queue_order = [index for index in self.play_queue_order
+                                     if index < queued]
+            self.queue_index = min(self.queue_index,
+                                   len(self.play_queue_order) - 1)
+            self._reconnect()
+            return method(self, *args, **kwargs)
+    wrapper.__name__ = method.__name__
+    wrapper.__doc__ = method.__doc__
+    return wrapper
+
+@instrumented(_STATS, _PROFILER)
 class tizplexproxy(object):
     """A class that accesses Plex servers, retrieves track URLs and creates and
     manages a playback queue.
@@ -165,8 +737,74 @@ class tizplexproxy(object):
         self.play_modes = TizEnumeration(["NORMAL", "SHUFFLE"])
         self.current_play_mode = self.play_modes.NORMAL
         self.now_playing_track = None
-        self._plex = PlexServer(base_url, token)
-        self._music = self._plex.library.section(section)
+        self._token = token
+        self._section = section
+        self._mirror = None
+        try:
+            self.stream_profile = StreamProfile(
+                os.environ.get('TIZONIA_PLEXPROXY_MAX_BITRATE', 0),
+                os.environ.get('TIZONIA_PLEXPROXY_CODEC',
+                               DEFAULT_TRANSCODE_CODEC),
+                os.environ.get('TIZONIA_PLEXPROXY_DIRECT_PLAY', 'auto'))
+        except ValueError as exception:
+            logging.info('Invalid stream profile settings: %s', exception)
+            print_wrn("[Plex] Invalid stream profile settings ({0}). " \
+                      "Using the defaults.".format(exception))
+            self.stream_profile = StreamProfile()
+        self.now_playing_stream = None
+        self._connect()
+
+    def _connect(self, failed=None):
+        """ Obtain the server and music section objects, and the section
+        mirror, if enabled.
+
+        """
+        server, music = shared_music_section(self.base_url, self._token,
+                                             self._section, failed)
+        self._plex = InstrumentedBackend(server, 'plexapi.server', _STATS)
+        self._music = InstrumentedBackend(music, 'plexapi.section', _STATS)
+        if os.environ.get('TIZONIA_PLEXPROXY_MIRROR'):
+            self._mirror = shared_section_mirror(
+                os.environ.get('TIZONIA_PLEXPROXY_MIRROR'), self._plex, music)
+
+    def _reconnect(self):
+        """ Connect to the server again, after the current connection has
+        failed.
+
+        """
+        print_wrn("[Plex] [Connection] '{0}' failed." \
+                  .format(to_ascii(self._plex._baseurl)))
+        self._connect(self._plex._baseurl)
+
+    def get_stats(self):
+        """ Return the call counters, latency percentiles (in seconds) and cache
+        hit rates collected so far by all the proxy objects in the process.
+
+        """
+        return _STATS.snapshot()
+
+    def set_profiling(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+        """ Enable or disable (with an empty 'directory') the profiling of a
+        sample of the proxy commands. This affects all the proxy objects in the
+        process.
+
+        :param directory: where to write the cProfile and tracemalloc results
+        :param sample_rate: the fraction of commands to profile (0.0 - 1.0)
+
+        """
+        _PROFILER.configure(directory, sample_rate)
+
+    def set_stream_profile(self, max_bitrate, codec, direct_play):
+        """ Change the way this player's tracks are streamed. The change
+        applies from the next track.
+
+        :param max_bitrate: the maximum bitrate in kbps (0 for no limit)
+        :param codec: the codec to transcode to (mp3, aac, opus or vorbis)
+        :param direct_play: 'auto' (transcode the tracks above the maximum
+                            bitrate), 'always' or 'never'
+
+        """
+        self.stream_profile.configure(max_bitrate, codec, direct_play)
 
     def set_play_mode(self, mode):
         """ Set the playback mode.
@@ -177,6 +815,7 @@ class tizplexproxy(object):
         self.current_play_mode = getattr(self.play_modes, mode)
         self.__update_play_queue_order()
 
+    @reconnecting
     def enqueue_audio_tracks(self, arg):
         """Search the Plex server for audio tracks and add them to the playback queue.
 
@@ -189,21 +828,31 @@ class tizplexproxy(object):
         try:
             count = len(self.queue)
 
-            try:
-                tracks = self._music.searchTracks(title=arg)
-                for track in tracks:
-                    track_info = TrackInfo(track, track.artist(), track.album())
-                    self.add_to_playback_queue(track_info)
+            for track in self.__mirror_tracks(arg):
+                track_info = TrackInfo(track)
+                self.add_to_playback_queue(track_info)
+
+            if count == len(self.queue):
+                try:
+                    tracks = self._music.searchTracks(title=arg)
+                    for track in tracks:
+                        track_info = TrackInfo(track)
+                        self.add_to_playback_queue(track_info)
 
-            except (NotFound):
-                pass
+                except (NotFound):
+                    pass
+
+            if count == len(self.queue):
+                for track in self.__mirror_closest_tracks(arg):
+                    track_info = TrackInfo(track)
+                    self.add_to_playback_queue(track_info)
 
             if count == len(self.queue):
                 tracks = self._music.search(libtype='track')
                 for track in tracks:
                     track_name = track.title
                     if fuzz.partial_ratio(arg, track_name) > 60:
-                        track_info = TrackInfo(track, track.artist(), track.album())
+                        track_info = TrackInfo(track)
                         self.add_to_playback_queue(track_info)
 
             if count == len(self.queue):
@@ -214,6 +863,7 @@ class tizplexproxy(object):
         except ValueError:
             raise ValueError(str("Track not found : %s" % arg))
 
+    @reconnecting
     def enqueue_audio_artist(self, arg):
         """Obtain an artist from the Plex server and add all the artist's audio tracks
         to the playback queue.
@@ -229,44 +879,52 @@ class tizplexproxy(object):
             artist = None
             artist_name = ''
 
-            try:
-                artists = self._music.searchArtists(title=arg)
-                for artist in artists:
-                    artist_name = artist.title
-                    print_wrn("[Plex] Playing '{0}'." \
-                              .format(artist_name))
-                    for album in artist.albums():
-                        for track in album.tracks():
-                            track_info = TrackInfo(track, artist, album)
-                            self.add_to_playback_queue(track_info)
+            artist = self.__mirror_lookup('artist', arg)
+            if artist:
+                artist_name = artist.title
+                print_wrn("[Plex] Playing '{0}'." \
+                          .format(artist_name))
+                self.__enqueue_artist_tracks(artist)
+
+            if count == len(self.queue):
+                try:
+                    artists = self._music.searchArtists(title=arg)
+                    for artist in artists:
+                        artist_name = artist.title
+                        print_wrn("[Plex] Playing '{0}'." \
+                                  .format(artist_name))
+                        self.__enqueue_artist_tracks(artist)
 
-            except (NotFound):
-                pass
+                except (NotFound):
+                    pass
 
             if count == len(self.queue):
-                artist_dict = dict()
-                artist_names = list()
-                artists = self._music.search(libtype='artist')
-                for art in artists:
-                    artist_names.append(art.title)
-                    artist_dict[art.title] = art
-
-                if len(artist_names) > 1:
-                    artist_name = process.extractOne(arg, artist_names)[0]
-                    artist = artist_dict[artist_name]
-                elif len(artist_names) == 1:
-                    artist_name = artist_names[0]
-                    artist = artist_dict[artist_name]
+                # The section mirror, if enabled, saves listing all the
+                # artists in the server
+                artist = self.__mirror_closest('artist', arg)
+                if artist:
+                    artist_name = artist.title
+                else:
+                    artist_dict = dict()
+                    artist_names = list()
+                    artists = self._music.search(libtype='artist')
+                    for art in artists:
+                        artist_names.append(art.title)
+                        artist_dict[art.title] = art
+
+                    if len(artist_names) > 1:
+                        artist_name = process.extractOne(arg, artist_names)[0]
+                        artist = artist_dict[artist_name]
+                    elif len(artist_names) == 1:
+                        artist_name = artist_names[0]
+                        artist = artist_dict[artist_name]
 
                 if artist:
                     print_wrn("[Plex] '{0}' not found. " \
                               "Playing '{1}' instead." \
                               .format(arg, \
                                       artist_name))
-                    for album in artist.albums():
-                        for track in album.tracks():
-                            track_info = TrackInfo(track, artist, album)
-                            self.add_to_playback_queue(track_info)
+                    self.__enqueue_artist_tracks(artist)
 
             if count == len(self.queue):
                 raise ValueError
@@ -276,6 +934,7 @@ class tizplexproxy(object):
         except ValueError:
             raise ValueError(str("Artist not found : %s" % arg))
 
+    @reconnecting
     def enqueue_audio_album(self, arg):
         """Obtain an album from the Plex server and add all its tracks to the playback
         queue.
@@ -291,42 +950,52 @@ class tizplexproxy(object):
             album = None
             album_name = ''
 
-            try:
-                albums = self._music.searchAlbums(title=arg)
-                for album in albums:
-                    album_name = album.title
-                    print_wrn("[Plex] Playing '{0}'." \
-                              .format(album_name))
-                    for track in album.tracks():
-                        track_info = TrackInfo(track, track.artist(), album)
-                        self.add_to_playback_queue(track_info)
+            album = self.__mirror_lookup('album', arg)
+            if album:
+                album_name = album.title
+                print_wrn("[Plex] Playing '{0}'." \
+                          .format(album_name))
+                self.__enqueue_album_tracks(album)
+
+            if count == len(self.queue):
+                try:
+                    albums = self._music.searchAlbums(title=arg)
+                    for album in albums:
+                        album_name = album.title
+                        print_wrn("[Plex] Playing '{0}'." \
+                                  .format(album_name))
+                        self.__enqueue_album_tracks(album)
 
-            except (NotFound):
-                pass
+                except (NotFound):
+                    pass
 
             if count == len(self.queue):
-                album_dict = dict()
-                album_names = list()
-                albums = self._music.search(libtype='album')
-                for alb in albums:
-                    album_names.append(alb.title)
-                    album_dict[alb.title] = alb
-
-                if len(album_names) > 1:
-                    album_name = process.extractOne(arg, album_names)[0]
-                    album = album_dict[album_name]
-                elif len(album_names) == 1:
-                    album_name = album_names[0]
-                    album = album_dict[album_name]
+                # The section mirror, if enabled, saves listing all the
+                # albums in the server
+                album = self.__mirror_closest('album', arg)
+                if album:
+                    album_name = album.title
+                else:
+                    album_dict = dict()
+                    album_names = list()
+                    albums = self._music.search(libtype='album')
+                    for alb in albums:
+                        album_names.append(alb.title)
+                        album_dict[alb.title] = alb
+
+                    if len(album_names) > 1:
+                        album_name = process.extractOne(arg, album_names)[0]
+                        album = album_dict[album_name]
+                    elif len(album_names) == 1:
+                        album_name = album_names[0]
+                        album = album_dict[album_name]
 
                 if album:
                     print_wrn("[Plex] '{0}' not found. " \
                               "Playing '{1}' instead." \
                               .format(arg, \
                                       album_name))
-                    for track in album.tracks():
-                        track_info = TrackInfo(track, album, album)
-                        self.add_to_playback_queue(track_info)
+                    self.__enqueue_album_tracks(album)
 
             if count == len(self.queue):
                 raise ValueError
@@ -336,6 +1005,7 @@ class tizplexproxy(object):
         except ValueError:
             raise ValueError(str("Album not found : %s" % arg))
 
+    @reconnecting
     def enqueue_audio_playlist(self, arg):
         """Add all audio tracks in a Plex playlist to the playback queue.
 
@@ -350,55 +1020,59 @@ class tizplexproxy(object):
             playlist_title = ''
             playlist = None
 
-            try:
-                playlist = self._plex.playlist(title=arg)
-                if playlist:
-                    playlist_title = playlist.title
-                    print_wrn("[Plex] Playing '{0}'." \
-                              .format(playlist_title))
-                    for item in list(playlist.items()):
-                        if item.TYPE == 'track':
-                            track = item
-                            track_info = TrackInfo(track, track.artist(), \
-                                                   track.album())
-                            self.add_to_playback_queue(track_info)
+            playlist = self.__mirror_lookup('playlist', arg)
+            if playlist:
+                playlist_title = playlist.title
+                print_wrn("[Plex] Playing '{0}'." \
+                          .format(playlist_title))
+                self.__enqueue_playlist_tracks(playlist)
+
+            if count == len(self.queue):
+                try:
+                    playlist = self._plex.playlist(title=arg)
+                    if playlist:
+                        playlist_title = playlist.title
+                        print_wrn("[Plex] Playing '{0}'." \
+                                  .format(playlist_title))
+                        self.__enqueue_playlist_tracks(playlist)
                         if count == len(self.queue):
                             print_wrn("[Plex] '{0}' No audio tracks found." \
                                       .format(playlist_title))
                             raise ValueError
 
-            except (NotFound):
-                pass
+                except (NotFound):
+                    pass
 
             if count == len(self.queue):
-                playlist_dict = dict()
-                playlist_titles = list()
-                playlists = self._plex.playlists()
-                for pl in playlists:
-                    playlist_titles.append(pl.title)
-                    playlist_dict[pl.title] = pl
-
-                if len(playlist_titles) > 1:
-                    playlist_title = process.extractOne(arg, playlist_titles)[0]
-                    playlist = playlist_dict[playlist_title]
-                elif len(playlist_titles) == 1:
-                    playlist_title = playlist_titles[0]
-                    playlist = playlist_dict[playlist_title]
+                # The section mirror, if enabled, saves listing all the
+                # playlists in the server
+                playlist = self.__mirror_closest('playlist', arg)
+                if playlist:
+                    playlist_title = playlist.title
+                else:
+                    playlist_dict = dict()
+                    playlist_titles = list()
+                    playlists = self._plex.playlists()
+                    for pl in playlists:
+                        playlist_titles.append(pl.title)
+                        playlist_dict[pl.title] = pl
+
+                    if len(playlist_titles) > 1:
+                        playlist_title = process.extractOne(arg, playlist_titles)[0]
+                        playlist = playlist_dict[playlist_title]
+                    elif len(playlist_titles) == 1:
+                        playlist_title = playlist_titles[0]
+                        playlist = playlist_dict[playlist_title]
 
                 if playlist:
                     print_wrn("[Plex] '{0}' not found. " \
                               "Playing '{1}' instead." \
                               .format(arg, \
                                       playlist_title))
-                    for item in list(playlist.items()):
-                        if item.TYPE == 'track':
-                            track = item
-                            track_info = TrackInfo(track, track.artist(), \
-                                                   track.album())
-                            self.add_to_playback_queue(track_info)
-                        if count == len(self.queue):
-                            print_wrn("[Plex] '{0}' No audio tracks found." \
-                                      .format(playlist_title))
+                    self.__enqueue_playlist_tracks(playlist)
+                    if count == len(self.queue):
+                        print_wrn("[Plex] '{0}' No audio tracks found." \
+                                  .format(playlist_title))
 
             if count == len(self.queue):
                 raise ValueError
@@ -482,7 +1156,7 @@ class tizplexproxy(object):
         track = self.now_playing_track
         bitrate = 0
         if track:
-            bitrate = track.bitrate
+            bitrate = self.now_playing_stream[1]
         return bitrate
 
     def current_audio_track_codec(self):
@@ -493,7 +1167,7 @@ class tizplexproxy(object):
         track = self.now_playing_track
         codec = ''
         if track:
-            codec = to_ascii(track.codec)
+            codec = to_ascii(self.now_playing_stream[2])
         return codec
 
     def current_audio_track_album_art(self):
@@ -602,13 +1276,154 @@ class tizplexproxy(object):
             print_nfo("[Plex] [Tracks in queue] '{0}'." \
                       .format(total_tracks))
 
+    def __enqueue_artist_tracks(self, artist):
+        """ Add all the tracks of an artist to the playback queue.
+
+        All the tracks are retrieved with a single request, and the albums
+        (for their release years) with another one.
+
+        """
+        albums = dict((str(album.ratingKey), album) for album in artist.albums())
+        for track in artist.tracks():
+            track_info = TrackInfo(track, artist,
+                                   albums.get(str(track.parentRatingKey)))
+            self.add_to_playback_queue(track_info)
+
+    def __enqueue_album_tracks(self, album):
+        """ Add all the tracks of an album to the playback queue.
+
+        """
+        for track in album.tracks():
+            track_info = TrackInfo(track, album=album)
+            self.add_to_playback_queue(track_info)
+
+    def __enqueue_playlist_tracks(self, playlist):
+        """ Add all the audio tracks of a playlist to the playback queue.
+
+        The items are retrieved PLAYLIST_PAGE_SIZE at a time, and the albums
+        of each page's tracks with as few metadata requests as possible. The
+        artist names are those in the tracks' grandparent fields.
+
+        """
+        albums = dict()
+        start = 0
+        while True:
+            items = self._plex.fetchItems(
+                '{0}/items?X-Plex-Container-Start={1}'
+                '&X-Plex-Container-Size={2}'.format(playlist.key, start,
+                                                    PLAYLIST_PAGE_SIZE))
+            tracks = [item for item in items if item.TYPE == 'track']
+            self.__fetch_metadata(set(str(track.parentRatingKey)
+                                      for track in tracks
+                                      if track.parentRatingKey), albums)
+            for track in tracks:
+                track_info = TrackInfo(track, None,
+                                       albums.get(str(track.parentRatingKey)))
+                self.add_to_playback_queue(track_info)
+            if len(items) < PLAYLIST_PAGE_SIZE:
+                break
+            start += len(items)
+
+    def __fetch_metadata(self, keys, items_by_key):
+        """ Retrieve the items with the given rating keys that are not in
+        'items_by_key' already, and add them to it.
+
+        """
+        keys = sorted(key for key in keys if key not in items_by_key)
+        for i in range(0, len(keys), METADATA_BATCH):
+            batch = keys[i:i + METADATA_BATCH]
+            try:
+                items = self._plex.fetchItems('/library/metadata/{0}' \
+                                              .format(','.join(batch)))
+            except NotFound:
+                continue
+            for item in items:
+                items_by_key[str(item.ratingKey)] = item
+
+    def __mirror_lookup(self, kind, arg):
+        """ Find an artist, album or playlist by the words in 'arg' in the
+        section mirror, and retrieve it from the server (None if the mirror is
+        disabled or has no match).
+
+        """
+        if not self._mirror:
+            return None
+        matches = self._mirror.search(kind, arg)
+        if not matches:
+            return None
+        return self.__mirror_fetch(matches[0][0])
+
+    def __mirror_closest(self, kind, arg):
+        """ Find the artist, album or playlist whose name is the closest to
+        'arg' in the section mirror, and retrieve it from the server (None if
+        the mirror is disabled or empty).
+
+        """
+        if not self._mirror:
+            return None
+        titles = self._mirror.titles(kind)
+        if not titles:
+            return None
+        title = process.extractOne(arg, list(titles))[0]
+        return self.__mirror_fetch(titles[title])
+
+    def __mirror_fetch(self, key):
+        """ Retrieve an item found in the section mirror from the server, and
+        drop it from the mirror if it no longer exists.
+
+        """
+        try:
+            return self._plex.fetchItem(key)
+        except NotFound:
+            self._mirror.forget(key)
+            return None
+
+    def __mirror_tracks(self, arg):
+        """ Find tracks by the words in 'arg' in the section mirror, and
+        retrieve them from the server (empty if the mirror is disabled or has
+        no match).
+
+        """
+        if not self._mirror:
+            return list()
+        return self.__fetch_tracks(
+            [str(key) for key, _ in
+             self._mirror.search('track', arg, MIRROR_MAX_TRACKS)])
+
+    def __mirror_closest_tracks(self, arg):
+        """ Find the tracks whose titles are close to 'arg' in the section
+        mirror, and retrieve them from the server (empty if the mirror is
+        disabled or has no match).
+
+        """
+        if not self._mirror:
+            return list()
+        return self.__fetch_tracks(
+            [str(key) for title, key in self._mirror.titles('track').items()
+             if fuzz.partial_ratio(arg, title) > 60][:MIRROR_MAX_TRACKS])
+
+    def __fetch_tracks(self, keys):
+        """ Retrieve tracks from the server, in the order of their keys.
+
+        """
+        tracks = dict()
+        self.__fetch_metadata(keys, tracks)
+        return [tracks[key] for key in keys if key in tracks]
+
     def __retrieve_track_url(self, track):
         """ Retrieve a track url
 
         """
         try:
             self.now_playing_track = track
-            return track.url
+            base_url = self._plex._baseurl
+            if track.base_url != base_url:
+                # Stream through the current connection to the server
+                track.url = base_url + track.url[len(track.base_url):]
+                track.base_url = base_url
+            self.now_playing_stream = self.stream_profile.stream(
+                track, base_url, self._token)
+            return self.now_playing_stream[0]
 
         except AttributeError:
             logging.info("Could not retrieve the track url!")
@@ -0,0 +1,379 @@
+# Copyright (C) 2011-2019 Aratelia Limited - Juan A. Rubio
+#
+# This file is part of Tizonia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""@package tizproxyd
+Shared proxy daemon.
+
+Hosts the Tizonia proxy objects (tizyoutubeproxy, tizspotifyproxy, etc) in a
+single long-running process that several tizonia processes reach over a Unix
+domain socket. Authenticated sessions and caches held at module level by the
+proxies are then shared by all the players on the host.
+
+The daemon is started with 'python3 -m tizproxyd'. The players use it when the
+TIZONIA_PROXY_DAEMON environment variable is set, either to the daemon's
+socket path or to any other non-empty value to use the default socket.
+
+"""
+
+import os
+import sys
+import types
+import logging
+import argparse
+import importlib
+import threading
+import unicodedata
+from multiprocessing.connection import Listener, Client
+from multiprocessing import AuthenticationError
+try:
+    import builtins
+except ImportError:
+    import __builtin__ as builtins
+
+FORMAT = '[%(asctime)s] [%(levelname)5s] [%(thread)d] ' \
+         '[%(module)s:%(funcName)s:%(lineno)d] - %(message)s'
+
+logging.captureWarnings(True)
+logging.getLogger().setLevel(logging.DEBUG)
+
+if os.environ.get('TIZONIA_PROXYD_DEBUG'):
+    logging.basicConfig(format=FORMAT)
+else:
+    logging.getLogger().addHandler(logging.NullHandler())
+
+# The proxies that may be hosted by the daemon. The Chromecast proxy is not
+# included, as it delivers status updates through callbacks into the player.
+PROXY_MODULES = ('tizgmusicproxy', 'tizplexproxy', 'tizsoundcloudproxy',
+                 'tizspotifyproxy', 'tizyoutubeproxy')
+
+# The methods called to release a proxy's session when its client goes away,
+# as the client libraries do when they stop
+PROXY_TEARDOWN = {'tizgmusicproxy': 'logout'}
+
+CONFIG_DIR = os.path.join(os.path.expanduser('~'), '.config/tizonia')
+
+DEFAULT_SOCKET = os.path.join(
+    os.environ.get('XDG_RUNTIME_DIR', CONFIG_DIR), 'tizproxyd.sock')
+
+AUTH_KEY_FILE = os.path.join(CONFIG_DIR, '.tizproxyd.key')
+
+class _Colors:
+    """A trivial class that defines various ANSI color codes.
+
+    """
+    BOLD = '\033[1m'
+    HEADER = '\033[95m'
+    OKBLUE = '\033[94m'
+    OKGREEN = '\033[92m'
+    WARNING = '\033[93m'
+    FAIL = '\033[91m'
+    ENDC = '\033[0m'
+
+def pretty_print(color, msg=""):
+    """Print message with color.
+
+    """
+    print(color + msg + _Colors.ENDC)
+
+def print_msg(msg=""):
+    """Print a normal message.
+
+    """
+    pretty_print(_Colors.OKGREEN + msg + _Colors.ENDC)
+
+def print_nfo(msg=""):
+    """Print an info message.
+
+    """
+    pretty_print(_Colors.OKBLUE + msg + _Colors.ENDC)
+
+def print_wrn(msg=""):
+    """Print a warning message.
+
+    """
+    pretty_print(_Colors.WARNING + msg + _Colors.ENDC)
+
+def print_err(msg=""):
+    """Print an error message.
+
+    """
+    pretty_print(_Colors.FAIL + msg + _Colors.ENDC)
+
+def to_ascii(msg):
+    """Unicode to ascii helper.
+
+    """
+
+    if sys.version[0] == '2':
+        return unicodedata.normalize('NFKD', str(msg)).encode('ASCII', 'ignore')
+    return msg
+
+def daemon_address():
+    """ Return the daemon's socket path, or None if the players have not been
+    configured to use the daemon.
+
+    """
+    value = os.environ.get('TIZONIA_PROXY_DAEMON', '')
+    if not value:
+        return None
+    if os.path.isabs(value):
+        return value
+    return DEFAULT_SOCKET
+
+def auth_key(create=False):
+    """ Retrieve the key shared by the daemon and its clients, optionally
+    creating it. Only processes that can read the user's configuration
+    directory are able to talk to the daemon.
+
+    """
+    if create and not os.path.isfile(AUTH_KEY_FILE):
+        if not os.path.isdir(CONFIG_DIR):
+            os.makedirs(CONFIG_DIR)
+        fd = os.open(AUTH_KEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(os.urandom(32))
+    with open(AUTH_KEY_FILE, 'rb') as f:
+        return f.read()
+
+class RemoteProxyError(Exception):
+    """ An error raised by a proxy inside the daemon, that has no equivalent
+    builtin exception type in the client.
+
+    """
+    pass
+
+class RemoteProxy(object):
+    """A stand-in for a proxy object that lives in the daemon.
+
+    Every attribute lookup returns a function that forwards the call to the
+    daemon; exceptions raised by the proxy are re-raised locally, and anything
+    the proxy printed while serving the call is written to this process'
+    stdout.
+
+    """
+
+    def __init__(self, address, name, *args):
+        self.__conn = Client(address, family='AF_UNIX', authkey=auth_key())
+        self.__lock = threading.Lock()
+        self.__request(('new', name, args))
+
+    def __getattr__(self, method):
+        if method.startswith('_'):
+            raise AttributeError(method)
+
+        def call(*args):
+            """ Invoke the proxy method in the daemon.
+
+            """
+            return self.__request(('call', method, args))
+
+        return call
+
+    def __request(self, request):
+        """ Send a request and wait for its reply.
+
+        """
+        with self.__lock:
+            self.__conn.send(request)
+            status, output, result = self.__conn.recv()
+        if output:
+            sys.stdout.write(output)
+            sys.stdout.flush()
+        if status != 'ok':
+            exc_name, exc_msg = result
+            exc_type = getattr(builtins, exc_name, None)
+            if not isinstance(exc_type, type) \
+               or not issubclass(exc_type, Exception):
+                exc_type = RemoteProxyError
+            raise exc_type(exc_msg)
+        return result
+
+def client_module(name):
+    """ Return the module the libtiz* wrappers should take the 'name' proxy
+    class from.
+
+    When the daemon is configured and reachable, this is a stand-in module
+    whose proxy class creates RemoteProxy objects. Otherwise, the proxy
+    module itself is imported and returned.
+
+    """
+    address = daemon_address()
+    if address and name in PROXY_MODULES:
+        try:
+            # Check that the daemon is alive and accepts our key
+            Client(address, family='AF_UNIX', authkey=auth_key()).close()
+            module = types.ModuleType(name)
+            setattr(module, name,
+                    lambda *args: RemoteProxy(address, name, *args))
+            return module
+        except (IOError, OSError, EOFError, AuthenticationError) as exception:
+            print_wrn("[Proxy daemon] '{0}' unavailable ({1}). " \
+                      "Using a local {2}." \
+                      .format(to_ascii(address), exception, name))
+    return importlib.import_module(name)
+
+class _ThreadOutput(object):
+    """A sys.stdout replacement that captures the output of the threads
+    serving client requests, so that it can be relayed to the clients.
+
+    """
+
+    def __init__(self, stream):
+        self.__stream = stream
+        self.__local = threading.local()
+
+    def begin(self):
+        """ Start capturing the current thread's output.
+
+        """
+        self.__local.chunks = list()
+
+    def end(self):
+        """ Stop capturing the current thread's output and return it.
+
+        """
+        chunks = getattr(self.__local, 'chunks', None)
+        self.__local.chunks = None
+        return ''.join(chunks) if chunks else ''
+
+    def write(self, text):
+        chunks = getattr(self.__local, 'chunks', None)
+        if chunks is not None:
+            chunks.append(text)
+        else:
+            self.__stream.write(text)
+
+    def flush(self):
+        self.__stream.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.__stream, name)
+
+class tizproxyd(object):
+    """A daemon that hosts proxy objects on behalf of tizonia processes.
+
+    Each client connection owns one proxy object, which is dropped when the
+    connection is closed. Connections are served concurrently, each in its own
+    thread.
+
+    """
+
+    def __init__(self, address=DEFAULT_SOCKET):
+        self.address = address
+        self.__output = _ThreadOutput(sys.stdout)
+
+    def serve_forever(self):
+        """ Accept and serve client connections until interrupted.
+
+        """
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+        authkey = auth_key(create=True)
+        # Create the socket with owner-only permissions from the start, so
+        # that there is no window in which other users can connect to it
+        umask = os.umask(0o077)
+        try:
+            listener = Listener(self.address, family='AF_UNIX',
+                                authkey=authkey)
+        finally:
+            os.umask(umask)
+        sys.stdout = self.__output
+        print_nfo("[Proxy daemon] [Listening] '{0}'" \
+                  .format(to_ascii(self.address)))
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (IOError, OSError, EOFError, AuthenticationError) \
+                       as exception:
+                    logging.info("Rejected connection: %s", exception)
+                    continue
+                worker = threading.Thread(target=self.__serve_connection,
+                                          args=(conn,))
+                worker.daemon = True
+                worker.start()
+        finally:
+            listener.close()
+            sys.stdout = sys.__stdout__
+
+    def __serve_connection(self, conn):
+        """ Serve the requests of a single client.
+
+        """
+        proxy = None
+        name = None
+        try:
+            while True:
+                request = conn.recv()
+                self.__output.begin()
+                try:
+                    if request[0] == 'new':
+                        self.__release_proxy(name, proxy)
+                        proxy = None
+                        proxy = self.__new_proxy(request[1], request[2])
+                        name = request[1]
+                        result = None
+                    else:
+                        result = getattr(proxy, request[1])(*request[2])
+                    conn.send(('ok', self.__output.end(), result))
+                except Exception as exception:
+                    logging.info("%s: %s", request[:2], exception)
+                    conn.send(('error', self.__output.end(),
+                               (type(exception).__name__, str(exception))))
+        except (IOError, OSError, EOFError):
+            pass
+        finally:
+            conn.close()
+            self.__release_proxy(name, proxy)
+            del proxy
+
+    @staticmethod
+    def __release_proxy(name, proxy):
+        """ Release the session of a proxy that is no longer in use.
+
+        """
+        teardown = PROXY_TEARDOWN.get(name)
+        if proxy is not None and teardown:
+            try:
+                getattr(proxy, teardown)()
+            except Exception as exception:
+                logging.info("%s.%s: %s", name, teardown, exception)
+
+    @staticmethod
+    def __new_proxy(name, args):
+        """ Instantiate one of the known proxy classes.
+
+        """
+        if name not in PROXY_MODULES:
+            raise ValueError(str("Unknown proxy: {0}".format(name)))
+        proxy_class = getattr(importlib.import_module(name), name)
+        return proxy_class(*args)
+
+def main():
+    """ Run the daemon.
+
+    """
+    parser = argparse.ArgumentParser(prog='tizproxyd')
+    parser.add_argument('-s', '--socket', default=DEFAULT_SOCKET,
+                        help='path of the Unix domain socket to listen on')
+    args = parser.parse_args()
+    try:
+        tizproxyd(args.socket).serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
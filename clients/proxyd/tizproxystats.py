@@ -0,0 +1,370 @@
+# Copyright (C) 2011-2019 Aratelia Limited - Juan A. Rubio
+#
+# This file is part of Tizonia
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#  http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""@package tizproxystats
+Call statistics and profiling of the Tizonia proxies.
+
+Counts the calls made to the public methods of a proxy class, and to its
+backend (pafy, plexapi, spotipy, etc), keeping a latency histogram of each,
+and optionally profiles a sample of them with cProfile and tracemalloc.
+
+"""
+
+import os
+import time
+import random
+import logging
+import cProfile
+import threading
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Upper bounds (in seconds) of the latency histogram buckets
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+                   10.0, 30.0, float('inf'))
+
+# Seconds between consecutive dumps of the statistics file
+STATS_DUMP_INTERVAL = 60
+
+class _CallStats(object):
+    """ The call and error counters and the latency histogram of a single
+    method.
+
+    """
+    __slots__ = ('calls', 'errors', 'seconds', 'buckets')
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+
+    def percentile(self, fraction):
+        """ Estimate a latency percentile by interpolating within the
+        histogram bucket that contains it.
+
+        """
+        rank = fraction * self.calls
+        count = 0
+        lower = 0.0
+        for upper, hits in zip(LATENCY_BUCKETS, self.buckets):
+            if hits and count + hits >= rank:
+                if upper == float('inf'):
+                    return lower
+                return lower + (upper - lower) * (rank - count) / hits
+            count += hits
+            lower = upper
+        return 0.0
+
+class ProxyStats(object):
+    """ Call counters, error counters and latency histograms of the proxy's
+    public methods and backend calls, plus the hit rates of its caches.
+
+    """
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.__lock = threading.Lock()
+        self.__calls = dict()
+        self.__caches = dict()
+
+    def record(self, name, seconds, failed=False):
+        """ Account for a call that took 'seconds' to complete.
+
+        """
+        with self.__lock:
+            stats = self.__calls.get(name)
+            if not stats:
+                stats = self.__calls[name] = _CallStats()
+            stats.calls += 1
+            stats.seconds += seconds
+            if failed:
+                stats.errors += 1
+            for i, upper in enumerate(LATENCY_BUCKETS):
+                if seconds <= upper:
+                    stats.buckets[i] += 1
+                    break
+
+    def record_cache(self, name, hit):
+        """ Account for a cache lookup.
+
+        """
+        with self.__lock:
+            hits, misses = self.__caches.get(name, (0, 0))
+            self.__caches[name] = (hits + 1, misses) if hit \
+                                  else (hits, misses + 1)
+
+    def snapshot(self):
+        """ Return the statistics collected so far, as a dictionary.
+
+        """
+        with self.__lock:
+            calls = dict()
+            for name, stats in self.__calls.items():
+                calls[name] = {'calls': stats.calls,
+                               'errors': stats.errors,
+                               'seconds': stats.seconds,
+                               'p50': stats.percentile(0.50),
+                               'p95': stats.percentile(0.95),
+                               'p99': stats.percentile(0.99)}
+            caches = dict()
+            for name, (hits, misses) in self.__caches.items():
+                caches[name] = {'hits': hits, 'misses': misses,
+                                'hit_rate': float(hits) / (hits + misses)}
+        return {'calls': calls, 'caches': caches}
+
+    def prometheus(self):
+        """ Return the statistics in Prometheus' text exposition format.
+
+        """
+        lines = list()
+        with self.__lock:
+            for name in sorted(self.__calls):
+                stats = self.__calls[name]
+                labels = 'proxy="{0}",method="{1}"'.format(self.proxy, name)
+                lines.append('tizonia_proxy_calls_total{{{0}}} {1}' \
+                             .format(labels, stats.calls))
+                lines.append('tizonia_proxy_errors_total{{{0}}} {1}' \
+                             .format(labels, stats.errors))
+                count = 0
+                for upper, hits in zip(LATENCY_BUCKETS, stats.buckets):
+                    count += hits
+                    bound = '+Inf' if upper == float('inf') else repr(upper)
+                    lines.append('tizonia_proxy_latency_seconds_bucket' \
+                                 '{{{0},le="{1}"}} {2}' \
+                                 .format(labels, bound, count))
+                lines.append('tizonia_proxy_latency_seconds_sum{{{0}}} {1!r}' \
+                             .format(labels, stats.seconds))
+                lines.append('tizonia_proxy_latency_seconds_count{{{0}}} {1}' \
+                             .format(labels, stats.calls))
+            for name in sorted(self.__caches):
+                hits, misses = self.__caches[name]
+                labels = 'proxy="{0}",cache="{1}"'.format(self.proxy, name)
+                lines.append('tizonia_proxy_cache_hits_total{{{0}}} {1}' \
+                             .format(labels, hits))
+                lines.append('tizonia_proxy_cache_misses_total{{{0}}} {1}' \
+                             .format(labels, misses))
+        return '\n'.join(lines) + '\n'
+
+    def dump(self, path):
+        """ Atomically (re)write the statistics file.
+
+        """
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus())
+        os.rename(tmp_path, path)
+
+    def start_dumping(self, path, interval=STATS_DUMP_INTERVAL):
+        """ Dump the statistics to 'path' every 'interval' seconds, from a
+        daemon thread.
+
+        """
+        def dump_forever():
+            """ The dumping thread's body.
+
+            """
+            while True:
+                time.sleep(interval)
+                try:
+                    self.dump(path)
+                except (IOError, OSError) as exception:
+                    logging.info("Could not write %s: %s", path, exception)
+
+        thread = threading.Thread(target=dump_forever)
+        thread.daemon = True
+        thread.start()
+
+# Number of allocation sites listed in each tracemalloc report
+PROFILE_TOP_ALLOCATIONS = 25
+
+# Fraction of the commands that are profiled, unless configured otherwise
+DEFAULT_PROFILE_RATE = 0.01
+
+class ProxyProfiler(object):
+    """ Optional cProfile and tracemalloc profiling of the proxy commands.
+
+    A sample of the commands is profiled, one at a time; for each of them a
+    '.prof' file (readable with the pstats module) and a '.malloc' report with
+    the biggest allocation increases are written to the profile directory.
+
+    """
+
+    def __init__(self, proxy):
+        self.proxy = proxy
+        self.directory = None
+        self.sample_rate = 0.0
+        self.__lock = threading.Lock()
+
+    def configure(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+        """ Enable profiling, or disable it if 'directory' is empty or cannot
+        be created.
+
+        :param directory: where to write the profiles
+        :param sample_rate: the fraction of commands to profile (0.0 - 1.0);
+        the default rate is used if this is not a number
+
+        """
+        try:
+            rate = float(sample_rate)
+        except (TypeError, ValueError):
+            rate = float('nan')
+        if rate != rate:
+            logging.info("Invalid profiling sample rate '%s', using %s",
+                         sample_rate, DEFAULT_PROFILE_RATE)
+            rate = DEFAULT_PROFILE_RATE
+        if directory and not os.path.isdir(directory):
+            try:
+                os.makedirs(directory)
+            except OSError as exception:
+                logging.info("Unable to create the profiling directory "
+                             "'%s' (%s); profiling disabled",
+                             directory, exception)
+                directory = None
+        self.sample_rate = max(0.0, min(1.0, rate))
+        self.directory = directory or None
+
+    def run(self, name, function, args, kwargs):
+        """ Invoke 'function', profiling the call if it has been sampled.
+
+        """
+        if not self.directory or random.random() >= self.sample_rate \
+           or not self.__lock.acquire(False):
+            return function(*args, **kwargs)
+        try:
+            return self.__profile(name, function, args, kwargs)
+        finally:
+            self.__lock.release()
+
+    def __profile(self, name, function, args, kwargs):
+        """ Invoke 'function' under cProfile and tracemalloc and write the
+        results.
+
+        """
+        tracing = tracemalloc is None or tracemalloc.is_tracing()
+        if not tracing:
+            tracemalloc.start()
+        before = tracemalloc.take_snapshot() if tracemalloc else None
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(function, *args, **kwargs)
+        finally:
+            after = tracemalloc.take_snapshot() if tracemalloc else None
+            if not tracing:
+                tracemalloc.stop()
+            prefix = os.path.join(self.directory, '{0}-{1}-{2}-{3}' \
+                                  .format(self.proxy, name, os.getpid(),
+                                          int(time.time() * 1000)))
+            try:
+                profiler.dump_stats(prefix + '.prof')
+                if before and after:
+                    with open(prefix + '.malloc', 'w') as f:
+                        for stat in after.compare_to(before, 'lineno') \
+                                    [:PROFILE_TOP_ALLOCATIONS]:
+                            f.write(str(stat) + '\n')
+            except (IOError, OSError) as exception:
+                logging.info("Could not write %s: %s", prefix, exception)
+
+def timed(function, name, stats):
+    """ Return a wrapper of 'function' that records its calls in 'stats' as
+    'name'.
+
+    """
+    def wrapper(*args, **kwargs):
+        """ Time a call to the wrapped function.
+
+        """
+        start = time.time()
+        failed = True
+        try:
+            result = function(*args, **kwargs)
+            failed = False
+            return result
+        finally:
+            stats.record(name, time.time() - start, failed)
+
+    wrapper.__name__ = getattr(function, '__name__', name)
+    wrapper.__doc__ = getattr(function, '__doc__', None)
+    return wrapper
+
+def profiled(function, name, profiler):
+    """ Return a wrapper of 'function' that profiles a sample of its calls.
+
+    """
+    def wrapper(*args, **kwargs):
+        """ Run the wrapped function through the profiler.
+
+        """
+        return profiler.run(name, function, args, kwargs)
+
+    wrapper.__name__ = getattr(function, '__name__', name)
+    wrapper.__doc__ = getattr(function, '__doc__', None)
+    return wrapper
+
+def instrumented(stats, profiler):
+    """ Return a class decorator that records, and optionally profiles, the
+    calls to all public methods.
+
+    """
+    def decorate(cls):
+        """ Wrap the public methods of 'cls'.
+
+        """
+        for name, attr in list(vars(cls).items()):
+            if not name.startswith('_') and callable(attr) \
+               and name not in ('get_stats', 'set_profiling'):
+                setattr(cls, name, timed(profiled(attr, name, profiler),
+                                         name, stats))
+        return cls
+    return decorate
+
+class InstrumentedBackend(object):
+    """ Wrap a backend module or client object, so that the calls made through
+    it are recorded in 'stats' as '<name>.<method>'.
+
+    """
+
+    def __init__(self, backend, name, stats):
+        self.__backend = backend
+        self.__name = name
+        self.__stats = stats
+
+    def __getattr__(self, attr):
+        value = getattr(self.__backend, attr)
+        if not callable(value) or isinstance(value, type):
+            return value
+        return timed(value, '{0}.{1}'.format(self.__name, attr), self.__stats)
+
+def proxy_instrumentation(proxy):
+    """ Create the statistics and profiler objects of a proxy, configured from
+    the TIZONIA_<PROXY>PROXY_STATS, TIZONIA_<PROXY>PROXY_PROFILE and
+    TIZONIA_<PROXY>PROXY_PROFILE_RATE environment variables.
+
+    :param proxy: the proxy's name, e.g. 'youtube'
+
+    """
+    prefix = 'TIZONIA_{0}PROXY_'.format(proxy.upper())
+    stats = ProxyStats(proxy)
+    if os.environ.get(prefix + 'STATS'):
+        stats.start_dumping(os.environ.get(prefix + 'STATS'))
+    profiler = ProxyProfiler(proxy)
+    if os.environ.get(prefix + 'PROFILE'):
+        profiler.configure(os.environ.get(prefix + 'PROFILE'),
+                           os.environ.get(prefix + 'PROFILE_RATE',
+                                          DEFAULT_PROFILE_RATE))
+    return stats, profiler
@@ -30,16 +30,24 @@
 #endif
 
 #include <boost/lexical_cast.hpp>
+#include <stdlib.h>
+
 #include <iostream>
 
 #include "tizsoundcloud.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
+using tiz::python::import_proxy_module;
+using tiz::python::init_python;
 
 /* This macro assumes the existence of an "int rc" local variable */
 #define try_catch_wrapper(expr)                                  \
   do                                                             \
     {                                                            \
+      const gil_guard gil;                                       \
       try                                                        \
         {                                                        \
           if (!rc)                                               \
@@ -70,7 +78,8 @@ namespace
   int check_deps ()
   {
     int rc = 1;
-    Py_Initialize ();
+    init_python ();
+    const gil_guard gil;
 
     try
       {
@@ -114,7 +123,7 @@ namespace
                         boost::python::object &py_global)
   {
     // Import the SoundCloud proxy module
-    py_main = bp::import ("tizsoundcloudproxy");
+    py_main = import_proxy_module ("tizsoundcloudproxy");
 
     // Retrieve the main module's namespace
     py_global = py_main.attr ("__dict__");
@@ -136,6 +145,14 @@ tizsoundcloud::tizsoundcloud (const std::string &oauth_token)
 
 tizsoundcloud::~tizsoundcloud ()
 {
+  // Drop the references to the Python objects while holding the GIL
+  if (Py_IsInitialized ())
+    {
+      const gil_guard gil;
+      py_gm_proxy_ = bp::object ();
+      py_global_ = bp::object ();
+      py_main_ = bp::object ();
+    }
 }
 
 int tizsoundcloud::init ()
@@ -230,6 +247,7 @@ int tizsoundcloud::play_tags (const std::string &tags)
 
 const char *tizsoundcloud::get_next_url ()
 {
+  const gil_guard gil;
   current_url_.clear ();
   try
     {
@@ -249,6 +267,7 @@ const char *tizsoundcloud::get_next_url ()
 
 const char *tizsoundcloud::get_prev_url ()
 {
+  const gil_guard gil;
   current_url_.clear ();
   try
     {
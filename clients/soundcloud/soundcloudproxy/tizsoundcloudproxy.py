@@ -28,12 +28,48 @@ import os
 import sys
 import logging
 import random
+import threading
 import soundcloud
 import collections
 import unicodedata
 from requests.exceptions import HTTPError
 from operator import itemgetter
 from fuzzywuzzy import process
+try:
+    from tizproxystats import (proxy_instrumentation, instrumented,
+                               InstrumentedBackend, DEFAULT_PROFILE_RATE)
+except ImportError:
+    # tizproxystats is installed with the proxy daemon; without it the proxy
+    # works as usual, but its calls are neither counted nor profiled
+    DEFAULT_PROFILE_RATE = 0.01
+
+    class _NoInstrumentation(object):
+        """ A stand-in for the statistics and profiler objects of
+        tizproxystats.
+
+        """
+        def record_cache(self, name, hit):
+            """ Ignore a cache lookup. """
+
+        def snapshot(self):
+            """ Return empty statistics. """
+            return {'calls': dict(), 'caches': dict()}
+
+        def configure(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+            """ Profiling is not available. """
+            logging.info("Profiling needs tizproxystats, not installed")
+
+    def proxy_instrumentation(proxy):
+        """ Return stand-ins for the proxy's statistics and profiler. """
+        return _NoInstrumentation(), _NoInstrumentation()
+
+    def instrumented(stats, profiler):
+        """ Return a class decorator that leaves the class unchanged. """
+        return lambda cls: cls
+
+    def InstrumentedBackend(backend, name, stats):
+        """ Return the backend itself, unwrapped. """
+        return backend
 import imp
 
 if sys.version[0] == '2':
@@ -127,6 +163,28 @@ def to_ascii(msg):
         return unicodedata.normalize('NFKD', str(msg)).encode('ASCII', 'ignore')
     return msg
 
+# The call statistics and profiler shared by the proxy objects in the process
+_STATS, _PROFILER = proxy_instrumentation('soundcloud')
+
+# SoundCloud clients, keyed by OAuth token. These are shared by all the proxy
+# objects in the process (e.g. when hosted by the proxy daemon, tizproxyd).
+_CLIENTS = dict()
+_CLIENTS_LOCK = threading.Lock()
+
+def shared_client(client_id, oauth_token):
+    """ Return the SoundCloud client for an OAuth token.
+
+    """
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(oauth_token)
+        _STATS.record_cache('clients', client is not None)
+        if client is None:
+            client = soundcloud.Client(client_id=client_id,
+                                       access_token=oauth_token)
+            _CLIENTS[oauth_token] = client
+        return client
+
+@instrumented(_STATS, _PROFILER)
 class tizsoundcloudproxy(object):
     """A class that logs into a SoundCloud account, retrieves track URLs
     on behalf of the user and creates and manages a playback queue.
@@ -135,10 +193,8 @@ class tizsoundcloudproxy(object):
     CLIENT_ID = 'f3399c9c80866d417ae70009dfc95b2e'
 
     def __init__(self, oauth_token):
-        self.__api = soundcloud.Client(
-            client_id=self.CLIENT_ID,
-            access_token=oauth_token
-        )
+        self.__api = InstrumentedBackend(
+            shared_client(self.CLIENT_ID, oauth_token), 'soundcloud', _STATS)
 
         self.queue = list()
         self.queue_index = -1
@@ -147,6 +203,24 @@ class tizsoundcloudproxy(object):
         self.current_play_mode = self.play_modes.NORMAL
         self.now_playing_track = None
 
+    def get_stats(self):
+        """ Return the call counters, latency percentiles (in seconds) and cache
+        hit rates collected so far by all the proxy objects in the process.
+
+        """
+        return _STATS.snapshot()
+
+    def set_profiling(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+        """ Enable or disable (with an empty 'directory') the profiling of a
+        sample of the proxy commands. This affects all the proxy objects in the
+        process.
+
+        :param directory: where to write the cProfile and tracemalloc results
+        :param sample_rate: the fraction of commands to profile (0.0 - 1.0)
+
+        """
+        _PROFILER.configure(directory, sample_rate)
+
     def logout(self):
         """ Reset the session to an unauthenticated, default state.
 
@@ -30,16 +30,24 @@
 #endif
 
 #include <boost/lexical_cast.hpp>
+#include <stdlib.h>
+
 #include <iostream>
 
 #include "tizspotify.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
+using tiz::python::import_proxy_module;
+using tiz::python::init_python;
 
 /* This macro assumes the existence of an "int rc" local variable */
 #define try_catch_wrapper(expr)                                  \
   do                                                             \
     {                                                            \
+      const gil_guard gil;                                       \
       try                                                        \
         {                                                        \
           if (!rc)                                               \
@@ -70,7 +78,8 @@ namespace
   int check_deps ()
   {
     int rc = 1;
-    Py_Initialize ();
+    init_python ();
+    const gil_guard gil;
 
     try
       {
@@ -114,7 +123,7 @@ namespace
                      boost::python::object &py_global)
   {
     // Import the Spotify proxy module
-    py_main = bp::import ("tizspotifyproxy");
+    py_main = import_proxy_module ("tizspotifyproxy");
 
     // Retrieve the main module's namespace
     py_global = py_main.attr ("__dict__");
@@ -149,6 +158,14 @@ tizspotify::tizspotify ()
 
 tizspotify::~tizspotify ()
 {
+  // Drop the references to the Python objects while holding the GIL
+  if (Py_IsInitialized ())
+    {
+      const gil_guard gil;
+      py_spotify_proxy_ = bp::object ();
+      py_global_ = bp::object ();
+      py_main_ = bp::object ();
+    }
 }
 
 int tizspotify::init ()
@@ -296,6 +313,7 @@ int tizspotify::play_recommendations_by_genre (const std::string &genre)
 
 const char *tizspotify::get_next_uri (const bool a_remove_current_uri)
 {
+  const gil_guard gil;
   current_uri_.clear ();
   try
     {
@@ -326,6 +344,7 @@ const char *tizspotify::get_next_uri (const bool a_remove_current_uri)
 
 const char *tizspotify::get_prev_uri (const bool a_remove_current_uri)
 {
+  const gil_guard gil;
   current_uri_.clear ();
   try
     {
@@ -29,14 +29,64 @@ import logging
 import random
 import unicodedata
 import re
+import bisect
+import time
+import pickle
+import weakref
+import threading
 import spotipy
 from spotipy.oauth2 import SpotifyClientCredentials
+from multiprocessing.dummy import Pool
 from fuzzywuzzy import process
 from fuzzywuzzy import fuzz
+try:
+    from tizproxystats import (proxy_instrumentation, instrumented,
+                               InstrumentedBackend, DEFAULT_PROFILE_RATE)
+except ImportError:
+    # tizproxystats is installed with the proxy daemon; without it the proxy
+    # works as usual, but its calls are neither counted nor profiled
+    DEFAULT_PROFILE_RATE = 0.01
+
+    class _NoInstrumentation(object):
+        """ A stand-in for the statistics and profiler objects of
+        tizproxystats.
+
+        """
+        def record_cache(self, name, hit):
+            """ Ignore a cache lookup. """
+
+        def snapshot(self):
+            """ Return empty statistics. """
+            return {'calls': dict(), 'caches': dict()}
+
+        def configure(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+            """ Profiling is not available. """
+            logging.info("Profiling needs tizproxystats, not installed")
+
+    def proxy_instrumentation(proxy):
+        """ Return stand-ins for the proxy's statistics and profiler. """
+        return _NoInstrumentation(), _NoInstrumentation()
+
+    def instrumented(stats, profiler):
+        """ Return a class decorator that leaves the class unchanged. """
+        return lambda cls: cls
+
+    def InstrumentedBackend(backend, name, stats):
+        """ Return the backend itself, unwrapped. """
+        return backend
 
 # For use during debugging
 from pprint import pprint
 
+# Number of playlists retrieved per request when indexing a user's playlists
+PLAYLIST_PAGE_SIZE = 50
+
+# Maximum age (in seconds) of a cached playlist index
+PLAYLIST_INDEX_TTL = 24 * 60 * 60
+
+# Maximum number of concurrent requests when retrieving paged results
+WORKER_THREADS = 4
+
 FORMAT = '[%(asctime)s] [%(levelname)5s] [%(thread)d] ' \
          '[%(module)s:%(funcName)s:%(lineno)d] - %(message)s'
 
@@ -122,27 +172,139 @@ def to_ascii(msg):
         return unicodedata.normalize('NFKD', str(msg)).encode('ASCII', 'ignore')
     return msg
 
+# The call statistics and profiler shared by the proxy objects in the process
+_STATS, _PROFILER = proxy_instrumentation('spotify')
+
+class ArtistInfo(object):
+    """ Class that represents an artist, shared by all the tracks of that artist
+    in the queue.
+
+    """
+    __slots__ = ('name', 'uri', '__weakref__')
+
+    def __init__(self, name, uri):
+        """ class members. """
+        self.name = name
+        self.uri = uri
+
+class AlbumInfo(object):
+    """ Class that represents an album, shared by all the tracks of that album in
+    the queue.
+
+    """
+    __slots__ = ('name', 'uri', 'release_date', 'thumb_url', '__weakref__')
+
+    def __init__(self, name, uri, release_date, thumb_url):
+        """ class members. """
+        self.name = name
+        self.uri = uri
+        self.release_date = release_date
+        self.thumb_url = thumb_url
+
+# Artist and album records currently referenced by tracks, keyed by URI (or by
+# name, when no URI is available).
+_ARTISTS = weakref.WeakValueDictionary()
+_ALBUMS = weakref.WeakValueDictionary()
+
+# Spotify clients, keyed by client id, and playlist indexes, keyed by owner.
+# These are shared by all the proxy objects in the process (e.g. when hosted
+# by the proxy daemon, tizproxyd).
+_CLIENTS = dict()
+_CLIENTS_LOCK = threading.Lock()
+_PLAYLIST_INDEXES = dict()
+
+def shared_spotify_client(client_id, client_secret):
+    """ Return the Spotify client for a set of client credentials.
+
+    """
+    with _CLIENTS_LOCK:
+        client = _CLIENTS.get(client_id)
+        _STATS.record_cache('clients', client is not None)
+        if client is None:
+            credentials = SpotifyClientCredentials(client_id=client_id,
+                                                   client_secret=client_secret)
+            client = spotipy.Spotify(client_credentials_manager=credentials)
+            _CLIENTS[client_id] = client
+        return client
+
+def shared_artist_info(artist):
+    """ Return the shared record of a Spotify artist object.
+
+    """
+    key = artist['uri'] or artist['name']
+    info = _ARTISTS.get(key)
+    if info is None:
+        info = ArtistInfo(artist['name'], artist['uri'])
+        _ARTISTS[key] = info
+    return info
+
+def shared_album_info(album):
+    """ Return the shared record of a Spotify album object.
+
+    """
+    name = album.get('name')
+    uri = album.get('uri') or ''
+    key = uri or name
+    info = _ALBUMS.get(key)
+    if info is None:
+        info = AlbumInfo(name, uri,
+                         album.get('release_date') or 'n/a',
+                         album['images'][0]['url'] if album.get('images') else None)
+        _ALBUMS[key] = info
+    return info
+
 class TrackInfo(object):
     """ Class that represents a Spotify track in the queue.
 
     """
+    __slots__ = ('title', 'duration', 'uri', 'explicit', 'artist_info', 'album_info')
 
-    def __init__(self, track, album_name=None):
-        """ class members. """
-        logging.info("TrackInfo")
+    def __init__(self, track, album=None):
+        """ class members.
+
+        :param track: a track object
+        :param album: the album object, for tracks that don't include one
+
+        """
         self.title = track['name']
-        self.artist = track['artists'][0]['name']
-        self.artist_uri = track['artists'][0]['uri']
-        self.album = track['album']['name'] if track.get('album') else album_name;
-        self.album_uri = track['album']['uri'] if track.get('album') and track.get('album').get('uri') else '';
-        self.release_date = track['album']['release_date'] if track.get('album') \
-            and track.get('album').get('release_date') else 'n/a';
-        self.duration = track['duration_ms'] / 1000 if track['duration_ms'] else 0;
+        self.duration = track['duration_ms'] / 1000 if track['duration_ms'] else 0
         self.uri = track['uri']
-        self.thumb_url = track['album']['images'][0]['url'] if track.get('album') and track.get('album').get('images') else None;
         self.explicit = track['explicit']
-        logging.info("TrackInfo end %s", track['explicit'])
-
+        self.artist_info = shared_artist_info(track['artists'][0])
+        album = track.get('album') or album
+        self.album_info = shared_album_info(album) if album else None
+
+    @property
+    def artist(self):
+        """ The track's artist name. """
+        return self.artist_info.name
+
+    @property
+    def artist_uri(self):
+        """ The track's artist URI. """
+        return self.artist_info.uri
+
+    @property
+    def album(self):
+        """ The track's album name. """
+        return self.album_info.name if self.album_info else None
+
+    @property
+    def album_uri(self):
+        """ The track's album URI. """
+        return self.album_info.uri if self.album_info else ''
+
+    @property
+    def release_date(self):
+        """ The track's album release date. """
+        return self.album_info.release_date if self.album_info else 'n/a'
+
+    @property
+    def thumb_url(self):
+        """ The track's album art URL. """
+        return self.album_info.thumb_url if self.album_info else None
+
+@instrumented(_STATS, _PROFILER)
 class tizspotifyproxy(object):
     """A class that accesses Spotify servers, retrieves track URLs and creates and
     manages a playback queue.
@@ -161,9 +323,33 @@ class tizspotifyproxy(object):
         self.explicit_filter_modes = TizEnumeration(["ALLOW", "DISALLOW"])
         self.current_explicit_filter_mode = self.explicit_filter_modes.DISALLOW
         self.ntracks_removed_from_queue = 0
+        self.explicit_queue_indexes = list()
         self.now_playing_track = None
-        credentials = SpotifyClientCredentials(client_id=self.SPOTIPY_CLIENT_ID, client_secret=self.SPOTIPY_CLIENT_SECRET)
-        self._spotify = spotipy.Spotify(client_credentials_manager=credentials)
+        self._spotify = InstrumentedBackend(
+            shared_spotify_client(self.SPOTIPY_CLIENT_ID,
+                                  self.SPOTIPY_CLIENT_SECRET), 'spotipy', _STATS)
+        # The queue may be extended from a background thread while a playlist
+        # is being retrieved
+        self.__queue_lock = threading.RLock()
+        self.__queue_generation = 0
+
+    def get_stats(self):
+        """ Return the call counters, latency percentiles (in seconds) and cache
+        hit rates collected so far by all the proxy objects in the process.
+
+        """
+        return _STATS.snapshot()
+
+    def set_profiling(self, directory, sample_rate=DEFAULT_PROFILE_RATE):
+        """ Enable or disable (with an empty 'directory') the profiling of a
+        sample of the proxy commands. This affects all the proxy objects in the
+        process.
+
+        :param directory: where to write the cProfile and tracemalloc results
+        :param sample_rate: the fraction of commands to profile (0.0 - 1.0)
+
+        """
+        _PROFILER.configure(directory, sample_rate)
 
     def set_play_mode(self, mode):
         """ Set the playback mode.
@@ -181,9 +367,10 @@ class tizspotifyproxy(object):
 
         """
         logging.info("")
-        self.current_explicit_filter_mode = getattr(self.explicit_filter_modes, filter_mode)
-        if self.current_explicit_filter_mode == self.explicit_filter_modes.DISALLOW:
-            self.__remove_explicit_tracks()
+        new_filter_mode = getattr(self.explicit_filter_modes, filter_mode)
+        if new_filter_mode != self.current_explicit_filter_mode:
+            self.current_explicit_filter_mode = new_filter_mode
+            self.__apply_explicit_track_filter()
 
     def enqueue_tracks(self, arg):
         """Search Spotify for audio tracks and add them to the playback queue.
@@ -195,14 +382,13 @@ class tizspotifyproxy(object):
         logging.info('arg : %s', arg_dec)
         print_msg("[Spotify] [Track search] '{0}'.".format(arg_dec))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             results = self._spotify.search(arg_dec, limit=20, offset=0, type='track')
             tracks = results['tracks']
             for i, track in enumerate(tracks['items']):
                 self.__enqueue_track(track)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('no tracks found arg : %s', arg_dec)
                 raise ValueError
 
@@ -222,7 +408,7 @@ class tizspotifyproxy(object):
         logging.info('arg : %s', arg_dec)
         print_msg("[Spotify] [Artist search] '{0}'.".format(arg_dec))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             artist = self.__search_artists(arg_dec)
 
             if not artist:
@@ -239,8 +425,7 @@ class tizspotifyproxy(object):
             if artist:
                 self.__enqueue_artist(artist)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('not tracks found arg : %s', arg_dec)
                 raise ValueError
 
@@ -260,7 +445,7 @@ class tizspotifyproxy(object):
         logging.info('arg : %s', arg_dec)
         print_msg("[Spotify] [Album search] '{0}'.".format(arg_dec))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             results = self._spotify.search(arg_dec, limit=10, offset=0, type='album')
             albums = results['albums']
             for i, album in enumerate(albums['items']):
@@ -268,8 +453,7 @@ class tizspotifyproxy(object):
                     self.__enqueue_album(album)
                 break
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 raise ValueError
 
             self.__update_play_queue_order()
@@ -288,7 +472,7 @@ class tizspotifyproxy(object):
         arg_dec = arg
         logging.info('arg : %s', arg_dec)
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             playlist = None
             playlist_name = None
             playlist_dict = dict()
@@ -326,8 +510,7 @@ class tizspotifyproxy(object):
                                                       playlist['id'], fields="tracks,next")
                 self.__enqueue_playlist(results)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 raise ValueError
 
             self.__update_play_queue_order()
@@ -347,7 +530,8 @@ class tizspotifyproxy(object):
         print_msg("[Spotify] [Playlist search] '{0}' (owner: {1})." \
                   .format(arg_dec, owner))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
+            queued = len(self.queue)
 
             if owner != 'anyuser':
                 playlist = self.__search_playlist(arg_dec, owner, is_featured=False)
@@ -356,15 +540,14 @@ class tizspotifyproxy(object):
                                                           fields="tracks,next")
                     self.__enqueue_playlist(results)
 
-            if count == len(self.queue) and owner != 'anyuser':
+            if queued == len(self.queue) and owner != 'anyuser':
                 print_wrn("[Spotify] [Playlist search] '{0}' not found in the user's library. " \
                           .format(arg_dec))
 
-            if count == len(self.queue) or owner == 'anyuser':
+            if queued == len(self.queue) or owner == 'anyuser':
                 self.enqueue_global_playlist(arg)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 raise ValueError
 
             self.__update_play_queue_order()
@@ -382,14 +565,13 @@ class tizspotifyproxy(object):
         arg_dec = arg
         logging.info('arg : %s', arg_dec)
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             artist = self.__search_artists(arg_dec)
 
             if artist:
                 self.__enqueue_related_artists(artist)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('not tracks found arg : %s', arg_dec)
                 raise ValueError
 
@@ -409,15 +591,14 @@ class tizspotifyproxy(object):
         logging.info('arg : %s', arg_dec)
         print_msg("[Spotify] [Featured playlist search] '{0}'.".format(arg_dec))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             playlist = self.__search_playlist(arg_dec, owner=None, is_featured=True)
             if playlist:
                 results = self._spotify.user_playlist(playlist['owner']['id'], playlist['id'],
                                                       fields="tracks,next")
                 self.__enqueue_playlist(results)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 raise ValueError
 
             self.__update_play_queue_order()
@@ -436,7 +617,7 @@ class tizspotifyproxy(object):
         logging.info('arg : %s', arg_dec)
         print_msg("[Spotify] [New Releases search] '{0}'.".format(arg_dec))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             album = None
             album_name = None
             album_dict = dict()
@@ -469,8 +650,7 @@ class tizspotifyproxy(object):
                               .format(arg_dec, album_name))
                 self.__enqueue_album(album)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 raise ValueError
 
             self.__update_play_queue_order()
@@ -488,14 +668,13 @@ class tizspotifyproxy(object):
         logging.info('id : %s', id)
         print_msg("[Spotify] [Track id] '{0}'.".format(id))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             track = self._spotify.track(id)
 
             if track:
                 self.__enqueue_track(track)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('track not found with id : %s', id)
                 raise ValueError
 
@@ -514,14 +693,13 @@ class tizspotifyproxy(object):
         logging.info('id : %s', id)
         print_msg("[Spotify] [Artist id] '{0}'.".format(id))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             artist = self._spotify.artist(id)
 
             if artist:
                 self.__enqueue_artist(artist)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('artist not found with id : %s', id)
                 raise ValueError
 
@@ -540,14 +718,13 @@ class tizspotifyproxy(object):
         logging.info('id : %s', id)
         print_msg("[Spotify] [Album id] '{0}'.".format(id))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             album = self._spotify.album(id)
 
             if album:
                 self.__enqueue_album(album)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 raise ValueError
 
             self.__update_play_queue_order()
@@ -566,14 +743,13 @@ class tizspotifyproxy(object):
         print_msg("[Spotify] [Playlist id] '{0}' (owner: {1})." \
                   .format(id, owner))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             playlist = self._spotify.user_playlist(owner, id)
 
             if playlist:
                 self.__enqueue_playlist(playlist)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('no playlist found with id : %s', id)
                 raise ValueError
 
@@ -592,7 +768,7 @@ class tizspotifyproxy(object):
         logging.info('id : %s', id)
         print_msg("[Spotify] [Recomendations by track id] '{0}'.".format(id))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             track_seed = list()
             track_seed.append(id)
             tracks = self._spotify.recommendations(seed_artists=None,
@@ -602,8 +778,7 @@ class tizspotifyproxy(object):
                 for track in tracks['tracks']:
                     self.__enqueue_track(track)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('no tracks found with track id : %s', id)
                 raise ValueError
 
@@ -622,7 +797,7 @@ class tizspotifyproxy(object):
         logging.info('id : %s', id)
         print_msg("[Spotify] [Recomendations by artist id] '{0}'.".format(id))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             artist_seed = list()
             artist_seed.append(id)
             tracks = self._spotify.recommendations(seed_artists=artist_seed,
@@ -632,8 +807,7 @@ class tizspotifyproxy(object):
                 for track in tracks['tracks']:
                     self.__enqueue_track(track)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('not tracks found with artist id : %s', id)
                 raise ValueError
 
@@ -653,7 +827,7 @@ class tizspotifyproxy(object):
         logging.info('id : %s', arg_dec)
         print_msg("[Spotify] [Recomendations by genre] '{0}'.".format(arg_dec))
         try:
-            count = len(self.queue)
+            count = len(self.play_queue_order)
             genre_seed = list()
             genre_name = None
             genre_names = list()
@@ -684,8 +858,7 @@ class tizspotifyproxy(object):
                 for track in tracks['tracks']:
                     self.__enqueue_track(track)
 
-            self.__remove_explicit_tracks()
-            if count == len(self.queue):
+            if count == len(self.play_queue_order):
                 logging.info('not tracks found with genre : %s', arg_dec)
                 raise ValueError
 
@@ -812,84 +985,97 @@ class tizspotifyproxy(object):
 
         """
         logging.info("current_track_queue_index_and_queue_length")
-        return self.play_queue_order[self.queue_index] + 1, len(self.queue)
+        return self.queue_index + 1, len(self.play_queue_order)
 
     def clear_queue(self):
         """ Clears the playback queue.
 
         """
-        self.queue = list()
-        self.queue_index = -1
+        with self.__queue_lock:
+            # Stop any background retrieval that is still feeding the old queue
+            self.__queue_generation += 1
+            self.queue = list()
+            self.queue_index = -1
+            self.play_queue_order = list()
+            self.explicit_queue_indexes = list()
+            self.ntracks_removed_from_queue = 0
 
     def remove_current_uri(self):
         """Remove the currently active uri from the playback queue.
 
         """
-        logging.info("%d - %d", self.queue_index, len(self.queue))
-        if len(self.queue) and self.queue_index >= 0:
-            track = self.queue[self.queue_index]
-            print_nfo("[Spotify] [Track] '{0}' removed." \
-                      .format(to_ascii(track.title)))
-            del self.queue[self.queue_index]
-            self.queue_index -= 1
-            if self.queue_index < 0:
-                self.queue_index = 0
-            self.__update_play_queue_order()
+        with self.__queue_lock:
+            logging.info("%d - %d", self.queue_index, len(self.play_queue_order))
+            if len(self.play_queue_order) and self.queue_index >= 0:
+                track = self.queue[self.play_queue_order[self.queue_index]]
+                print_nfo("[Spotify] [Track] '{0}' removed." \
+                          .format(to_ascii(track.title)))
+                # The track stays in self.queue so that queue indexes remain
+                # stable; it is just not played anymore.
+                queue_index = self.play_queue_order.pop(self.queue_index)
+                if track.explicit:
+                    self.explicit_queue_indexes.remove(queue_index)
+                self.queue_index -= 1
+                if self.queue_index < 0:
+                    self.queue_index = 0
+                self.__update_play_queue_order()
 
     def next_uri(self):
         """ Retrieve the uri of the next track in the playback queue.
 
         """
-        logging.info("")
-        try:
-            if len(self.queue):
-                logging.info("")
-                self.queue_index += 1
-                if (self.queue_index < len(self.queue)) \
-                   and (self.queue_index >= 0):
+        with self.__queue_lock:
+            logging.info("")
+            try:
+                if len(self.play_queue_order):
                     logging.info("")
-                    next_track = self.queue[self.play_queue_order \
-                                            [self.queue_index]]
-                    return self.__retrieve_track_uri(next_track)
+                    self.queue_index += 1
+                    if (self.queue_index < len(self.play_queue_order)) \
+                       and (self.queue_index >= 0):
+                        logging.info("")
+                        next_track = self.queue[self.play_queue_order \
+                                                [self.queue_index]]
+                        return self.__retrieve_track_uri(next_track)
+                    else:
+                        logging.info("%d - %d", self.queue_index, len(self.play_queue_order))
+                        self.queue_index = -1
+                        return self.next_uri()
                 else:
-                    logging.info("%d - %d", self.queue_index, len(self.queue))
-                    self.queue_index = -1
-                    return self.next_uri()
-            else:
-                logging.info("")
-                return ''
-        except (KeyError, AttributeError):
-            # TODO: We don't remove this for now
-            # del self.queue[self.queue_index]
-            logging.info("exception")
-            return self.next_uri()
+                    logging.info("")
+                    return ''
+            except (KeyError, AttributeError):
+                # TODO: We don't remove this for now
+                # del self.queue[self.queue_index]
+                logging.info("exception")
+                return self.next_uri()
 
     def prev_uri(self):
         """ Retrieve the uri of the previous track in the playback queue.
 
         """
-        logging.info("")
-        try:
-            if len(self.queue):
-                logging.info("")
-                self.queue_index -= 1
-                if (self.queue_index < len(self.queue)) \
-                   and (self.queue_index >= 0):
+        with self.__queue_lock:
+            logging.info("")
+            try:
+                if len(self.play_queue_order):
                     logging.info("")
-                    prev_track = self.queue[self.play_queue_order \
-                                            [self.queue_index]]
-                    return self.__retrieve_track_uri(prev_track)
+                    self.queue_index -= 1
+                    if (self.queue_index < len(self.play_queue_order)) \
+                       and (self.queue_index >= 0):
+                        logging.info("")
+                        prev_track = self.queue[self.play_queue_order \
+                                                [self.queue_index]]
+                        return self.__retrieve_track_uri(prev_track)
+                    else:
+                        logging.info("")
+                        self.queue_index = len(self.play_queue_order)
+                        return self.prev_uri()
                 else:
-                    logging.info("")
-                    self.queue_index = len(self.queue)
-                    return self.prev_uri()
-            else:
-                return ''
-        except (KeyError, AttributeError):
-            # TODO: We don't remove this for now
-            # del self.queue[self.queue_index]
-            logging.info("exception")
-            return self.prev_uri()
+                    return ''
+            except (KeyError, AttributeError):
+                # TODO: We don't remove this for now
+                # del self.queue[self.queue_index]
+                logging.info("exception")
+                return self.prev_uri()
 
     def __enqueue_track(self, track):
         """ Add a track to the playback queue.
@@ -927,7 +1113,7 @@ class tizspotifyproxy(object):
                         print_wrn("[Spotify] [Album] '{0}'.".format(album['name']))
                         tracks = self._spotify.album_tracks(album['id'], limit=50, offset=0)
                         for j, track in enumerate(tracks['items']):
-                            track_info = TrackInfo(track, album['name'])
+                            track_info = TrackInfo(track, album)
                             self.add_to_playback_queue(track_info)
                 except:
                     pass
@@ -964,7 +1150,7 @@ class tizspotifyproxy(object):
             try:
                 results = self._spotify.album_tracks(album['id'], limit=50, offset=0)
                 for track in results['items']:
-                    track_info = TrackInfo(track, album_name)
+                    track_info = TrackInfo(track, album)
                     self.add_to_playback_queue(track_info)
             except:
                 pass
@@ -972,20 +1158,67 @@ class tizspotifyproxy(object):
     def __enqueue_playlist(self, playlist):
         """ Add an playlist tracks to the playback queue.
 
+        The tracks in the first page are queued straight away. The remaining
+        pages are requested concurrently and appended, in order, as they
+        arrive, from a background thread.
+
         :param playlist: a playlist object
 
         """
         if playlist:
             tracks = playlist['tracks']
-            while tracks:
-                for i, item in enumerate(tracks['items']):
-                    track = item['track']
-                    track_info = TrackInfo(track)
-                    self.add_to_playback_queue(track_info)
-                if tracks['next']:
-                    tracks = self._spotify.next(tracks)
+            count = len(self.play_queue_order)
+            self.__enqueue_playlist_items(tracks['items'])
+            if tracks.get('next'):
+                limit = tracks.get('limit') or len(tracks['items'])
+                first = tracks.get('offset', 0) + limit
+                page_urls = [re.sub(r'offset=\d+', 'offset={0}'.format(offset),
+                                    tracks['next']) \
+                             for offset in range(first, tracks['total'], limit)]
+                if count == len(self.play_queue_order):
+                    # Nothing playable yet; wait for the remaining pages
+                    self.__enqueue_playlist_pages(page_urls, self.__queue_generation)
                 else:
-                    tracks = None
+                    worker = threading.Thread(target=self.__enqueue_playlist_pages,
+                                              args=(page_urls, self.__queue_generation))
+                    worker.daemon = True
+                    worker.start()
+
+    def __enqueue_playlist_pages(self, page_urls, generation):
+        """ Retrieve pages of playlist tracks concurrently and add them to the
+        playback queue in playlist order.
+
+        :param page_urls: the urls of the pages to retrieve
+        :param generation: the queue generation the tracks are meant for
+
+        """
+        pool = Pool(min(WORKER_THREADS, len(page_urls)))
+        try:
+            pages = pool.imap(lambda url: self._spotify.next(dict(next=url)), page_urls)
+            for page in pages:
+                with self.__queue_lock:
+                    if generation != self.__queue_generation:
+                        # The queue has been cleared in the meantime
+                        break
+                    self.__enqueue_playlist_items(page['items'])
+            print_nfo("[Spotify] [Tracks in queue] '{0}'." \
+                      .format(len(self.play_queue_order)))
+        except Exception as exception:
+            logging.info("could not retrieve playlist tracks : %s", exception)
+        finally:
+            pool.close()
+
+    def __enqueue_playlist_items(self, items):
+        """ Add the tracks in a page of playlist items to the playback queue.
+
+        :param items: a list of playlist items
+
+        """
+        for item in items:
+            track = item['track']
+            if track:
+                track_info = TrackInfo(track)
+                self.add_to_playback_queue(track_info)
 
     def __search_artists(self, arg):
         """ Add an artist tracks to the playback queue.
@@ -1022,53 +1255,27 @@ class tizspotifyproxy(object):
         return artist
 
     def __search_playlist(self, arg, owner=None, is_featured=False):
-        """ Add an artist tracks to the playback queue.
+        """ Search a playlist by name, either in the featured playlists or in the
+        playlists of a given user.
 
-        :param artist: a artist object
+        :param arg: a playlist search term
+        :param owner: the user that owns the playlist
+        :param is_featured: True to search in Spotify's featured playlists
 
         """
         playlist = None
         if arg:
-            playlists = None
-            playlist_name = None
-            playlist_dict = dict()
-            playlist_names = list()
-            playlist_count = 0
+            from_cache = False
             if is_featured:
-                featured_playlists = self._spotify.featured_playlists()
-                if featured_playlists:
-                    playlists = featured_playlists['playlists']
+                playlists = self.__featured_playlists()
             else:
-                playlists = self._spotify.user_playlists(owner)
-            while playlists:
-                for i, plist in enumerate(playlists['items']):
-                    playlist_count+=1
-                    print_nfo("[Spotify] [Playlist {0}] '{1}' ({2} tracks)." \
-                              .format(playlist_count, to_ascii(plist['name']), plist['tracks']['total']))
-                    name = plist['name']
-                    if arg.lower() == name.lower():
-                        playlist_name = name
-                        playlist = plist
-                        break
-                    if fuzz.partial_ratio(arg, name) > 50:
-                        playlist_dict[name] = plist
-                        playlist_names.append(name)
-
-                if not playlist_name:
-                    if playlists['next']:
-                        playlists = self._spotify.next(playlists)
-                    else:
-                        playlists = None
-                else:
-                    break
+                playlists, from_cache = self.__user_playlist_index(owner)
 
-            if not playlist_name:
-                if len(playlist_names) > 1:
-                    playlist_name = process.extractOne(arg, playlist_names)[0]
-                    playlist = playlist_dict[playlist_name]
-                elif len(playlist_names) == 1:
-                    playlist_name = playlist_names[0]
-                    playlist = playlist_dict[playlist_name]
+            playlist_name, playlist = self.__match_playlist(arg, playlists)
+            if not playlist_name and from_cache:
+                # The cached index may predate the playlist; refresh it once
+                playlists, _ = self.__user_playlist_index(owner, refresh=True)
+                playlist_name, playlist = self.__match_playlist(arg, playlists)
 
             if playlist_name:
                 if arg.lower() != playlist_name.lower():
@@ -1081,6 +1288,151 @@ class tizspotifyproxy(object):
 
         return playlist
 
+    def __match_playlist(self, arg, playlists):
+        """ Find the playlist that best matches a search term. An exact (case
+        insensitive) match ends the search early; otherwise the closest fuzzy
+        match is returned.
+
+        :param arg: a playlist search term
+        :param playlists: a list of playlist objects
+
+        """
+        playlist_dict = dict()
+        playlist_names = list()
+        arg_lower = arg.lower()
+        for plist in playlists:
+            name = plist['name']
+            if arg_lower == name.lower():
+                return name, plist
+            if fuzz.partial_ratio(arg, name) > 50:
+                playlist_dict[name] = plist
+                playlist_names.append(name)
+
+        if len(playlist_names) > 1:
+            playlist_name = process.extractOne(arg, playlist_names)[0]
+            return playlist_name, playlist_dict[playlist_name]
+        elif len(playlist_names) == 1:
+            return playlist_names[0], playlist_dict[playlist_names[0]]
+        return None, None
+
+    def __featured_playlists(self):
+        """ Retrieve Spotify's featured playlists.
+
+        """
+        items = list()
+        featured_playlists = self._spotify.featured_playlists()
+        playlists = featured_playlists['playlists'] if featured_playlists else None
+        while playlists:
+            for plist in playlists['items']:
+                if plist:
+                    print_nfo("[Spotify] [Playlist {0}] '{1}' ({2} tracks)." \
+                              .format(len(items) + 1, to_ascii(plist['name']),
+                                      plist['tracks']['total']))
+                    items.append(plist)
+            if playlists['next']:
+                page = self._spotify.next(playlists)
+                playlists = page.get('playlists', page)
+            else:
+                playlists = None
+        return items
+
+    def __user_playlist_index(self, owner, refresh=False):
+        """ Retrieve the index of a user's playlists.
+
+        The index is kept in memory and on disk, and it is only downloaded again
+        from Spotify once it is older than PLAYLIST_INDEX_TTL seconds.
+
+        :param owner: the user that owns the playlists
+        :param refresh: True to ignore the cached index
+
+        Returns a tuple with the list of playlists and a flag that indicates
+        whether they came from the cache.
+
+        """
+        index = None
+        if not refresh:
+            index = _PLAYLIST_INDEXES.get(owner)
+            if not index:
+                index = self.__load_playlist_index(owner)
+        if index and time.time() - index['timestamp'] < PLAYLIST_INDEX_TTL:
+            _PLAYLIST_INDEXES[owner] = index
+            _STATS.record_cache('playlist_index', True)
+            return index['playlists'], True
+
+        _STATS.record_cache('playlist_index', False)
+        index = dict(timestamp=time.time(),
+                     playlists=self.__fetch_playlist_index(owner))
+        _PLAYLIST_INDEXES[owner] = index
+        self.__save_playlist_index(owner, index)
+        return index['playlists'], False
+
+    def __fetch_playlist_index(self, owner):
+        """ Retrieve all the playlists of a user from Spotify. Once the first
+        page is received and the total number of playlists is known, the
+        remaining pages are requested concurrently.
+
+        :param owner: the user that owns the playlists
+
+        """
+        first_page = self._spotify.user_playlists(owner, limit=PLAYLIST_PAGE_SIZE)
+        pages = [first_page]
+        offsets = list(range(PLAYLIST_PAGE_SIZE, first_page['total'],
+                             PLAYLIST_PAGE_SIZE))
+        if offsets:
+            pool = Pool(min(WORKER_THREADS, len(offsets)))
+            try:
+                pages += pool.map(lambda offset: self._spotify.user_playlists \
+                                  (owner, limit=PLAYLIST_PAGE_SIZE,
+                                   offset=offset), offsets)
+            finally:
+                pool.close()
+
+        playlists = list()
+        for page in pages:
+            for plist in page['items']:
+                if plist:
+                    # Keep only the fields that are needed to find and
+                    # enqueue the playlist
+                    playlists.append(dict(name=plist['name'], id=plist['id'],
+                                          owner=dict(id=plist['owner']['id']),
+                                          tracks=dict(total=plist['tracks']['total'])))
+
+        print_nfo("[Spotify] [Playlists] '{0}' playlists found (owner: {1})." \
+                  .format(len(playlists), owner))
+        return playlists
+
+    def __playlist_index_file(self, owner):
+        """ Return the path of the file where a user's playlist index is cached.
+
+        """
+        userdir = os.path.expanduser('~')
+        return os.path.join(userdir, ".config/tizonia/.spotify." + owner + ".playlists")
+
+    def __load_playlist_index(self, owner):
+        """ Load a user's playlist index from disk, if it exists.
+
+        """
+        index = None
+        try:
+            with open(self.__playlist_index_file(owner), "rb") as f:
+                index = pickle.load(f)
+        except (IOError, OSError, EOFError, pickle.UnpicklingError):
+            logging.info("no cached playlist index for owner : %s", owner)
+        return index
+
+    def __save_playlist_index(self, owner, index):
+        """ Save a user's playlist index to disk.
+
+        """
+        path = self.__playlist_index_file(owner)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as f:
+                pickle.dump(index, f)
+        except (IOError, OSError):
+            logging.info("could not save playlist index for owner : %s", owner)
+
     def __update_play_queue_order(self):
         """ Update the queue playback order.
 
@@ -1088,39 +1440,84 @@ class tizspotifyproxy(object):
         random order if current play mode is "SHUFFLE"
 
         """
-        total_tracks = len(self.queue)
-        if total_tracks:
-            if not len(self.play_queue_order):
-                # Create a sequential play order, if empty
-                self.play_queue_order = list(range(total_tracks))
-            if self.current_play_mode == self.play_modes.SHUFFLE:
-                random.shuffle(self.play_queue_order)
-            print_nfo("[Spotify] [Tracks in queue] '{0}'." \
-                      .format(total_tracks))
+        with self.__queue_lock:
+            total_tracks = len(self.play_queue_order)
+            if total_tracks:
+                if self.current_play_mode == self.play_modes.SHUFFLE:
+                    random.shuffle(self.play_queue_order)
+                else:
+                    self.play_queue_order.sort()
+                print_nfo("[Spotify] [Tracks in queue] '{0}'." \
+                          .format(total_tracks))
+                if self.ntracks_removed_from_queue:
+                    print_nfo("[Spotify] [Queue] '{0}' explicit tracks filtered out." \
+                              .format(self.ntracks_removed_from_queue))
 
-    def __remove_explicit_tracks(self):
-        """ Remove all explicit tracks from the playback queue.
+    def __add_to_play_queue_order(self, queue_index):
+        """ Make a queued track playable by adding it to the play order.
+
+        In "NORMAL" mode the track is placed according to its position in the
+        queue; in "SHUFFLE" mode it is placed at a random position after the
+        current track.
 
         """
-        ntracks_in_queue_before = len(self.queue)
-        logging.info("__remove_explicit_tracks : %s - tracks before %d", \
-                     self.current_explicit_filter_mode, ntracks_in_queue_before)
-        if self.current_explicit_filter_mode == self.explicit_filter_modes.DISALLOW \
-           and ntracks_in_queue_before > 0:
-            logging.info("")
-            self.queue[:] = [t for t in self.queue if t.explicit == False]
-            logging.info("")
-            if len(self.queue) == 0:
-                self.queue_index = -1
-            elif self.queue_index >= len(self.queue):
-                self.queue_index = 0
-
-            logging.info("__remove_explicit_tracks : tracks after %d", \
-                         len(self.queue))
-            if ntracks_in_queue_before > len(self.queue):
-                self.ntracks_removed_from_queue = ntracks_in_queue_before - len(self.queue)
+        if self.current_play_mode == self.play_modes.SHUFFLE:
+            pos = random.randint(self.queue_index + 1, len(self.play_queue_order))
+        else:
+            pos = bisect.bisect(self.play_queue_order, queue_index)
+        self.play_queue_order.insert(pos, queue_index)
+        if pos <= self.queue_index:
+            self.queue_index += 1
+
+    def __play_queue_position(self, queue_index):
+        """ Return the position of a queued track in the play order, or None if
+        it is not in it.
+
+        In "NORMAL" mode the play order is sorted, so the track is looked up
+        with a binary search.
+
+        """
+        if self.current_play_mode == self.play_modes.SHUFFLE:
+            try:
+                return self.play_queue_order.index(queue_index)
+            except ValueError:
+                return None
+        pos = bisect.bisect_left(self.play_queue_order, queue_index)
+        if pos < len(self.play_queue_order) \
+           and self.play_queue_order[pos] == queue_index:
+            return pos
+        return None
+
+    def __apply_explicit_track_filter(self):
+        """ Add or remove the explicit tracks to/from the play order, according to
+        the current explicit filter mode.
+
+        Only the tracks recorded in the explicit track index are visited.
+
+        """
+        with self.__queue_lock:
+            if not self.explicit_queue_indexes:
+                return
+
+            if self.current_explicit_filter_mode == self.explicit_filter_modes.ALLOW:
+                for queue_index in self.explicit_queue_indexes:
+                    self.__add_to_play_queue_order(queue_index)
+                self.ntracks_removed_from_queue = 0
+                print_nfo("[Spotify] [Queue] '{0}' explicit tracks added ({1} now in queue)." \
+                          .format(len(self.explicit_queue_indexes), len(self.play_queue_order)))
+            else:
+                removed = 0
+                for queue_index in self.explicit_queue_indexes:
+                    pos = self.__play_queue_position(queue_index)
+                    if pos is None:
+                        continue
+                    del self.play_queue_order[pos]
+                    if pos <= self.queue_index:
+                        self.queue_index -= 1
+                    removed += 1
+                self.ntracks_removed_from_queue = removed
                 print_nfo("[Spotify] [Queue] '{0}' explicit tracks removed ({1} now in queue)." \
-                          .format(self.ntracks_removed_from_queue, len(self.queue)))
+                          .format(self.ntracks_removed_from_queue, len(self.play_queue_order)))
 
     def __retrieve_track_uri(self, track):
         """ Retrieve a track uri
@@ -1135,21 +1532,30 @@ class tizspotifyproxy(object):
             raise
 
     def add_to_playback_queue(self, track):
-        """ Add to the playback queue. """
-
-        if not track.explicit:
-            print_nfo("[Spotify] [Track] '{0}' [{1}]." \
-                      .format(to_ascii(track.title), \
-                              to_ascii(track.artist)))
-        # Make sure explicit track titles are not printed if these are not
-        # allowed.
-        if track.explicit and \
-           (self.current_explicit_filter_mode == self.explicit_filter_modes.ALLOW):
-            print_nfo("[Spotify] [Track] '{0}' [{1}] (Explicit)." \
-                      .format(to_ascii(track.title), \
-                              to_ascii(track.artist)))
-        queue_index = len(self.queue)
-        self.queue.append(track)
+        """ Add to the playback queue.
+
+        Explicit tracks are recorded in the explicit track index. They are only
+        added to the play order if the current filter mode allows them.
+
+        """
+        with self.__queue_lock:
+            queue_index = len(self.queue)
+            self.queue.append(track)
+            if track.explicit:
+                self.explicit_queue_indexes.append(queue_index)
+                # Make sure explicit track titles are not printed if these are not
+                # allowed.
+                if self.current_explicit_filter_mode == self.explicit_filter_modes.DISALLOW:
+                    self.ntracks_removed_from_queue += 1
+                    return
+                print_nfo("[Spotify] [Track] '{0}' [{1}] (Explicit)." \
+                          .format(to_ascii(track.title), \
+                                  to_ascii(track.artist)))
+            else:
+                print_nfo("[Spotify] [Track] '{0}' [{1}]." \
+                          .format(to_ascii(track.title), \
+                                  to_ascii(track.artist)))
+            self.__add_to_play_queue_order(queue_index)
 
 
 if __name__ == "__main__":
@@ -30,8 +30,13 @@
 #endif
 
 
+#include <fcntl.h>
+#include <stdlib.h>
+#include <unistd.h>
+
 #include <iostream>
 #include <vector>
+#include <boost/bind.hpp>
 #include <boost/lexical_cast.hpp>
 #include <boost/algorithm/string/split.hpp>
 #include <boost/algorithm/string/classification.hpp>
@@ -40,7 +45,12 @@
 
 #include "tizyoutube.hpp"
 
+#include <tizpyproxy.hpp>
+
 namespace bp = boost::python;
+using tiz::python::gil_guard;
+using tiz::python::import_proxy_module;
+using tiz::python::init_python;
 
 /* This macro assumes the existence of an "int rc" local variable */
 #define try_catch_wrapper(expr)                                  \
@@ -76,7 +86,6 @@ namespace
   int check_deps ()
   {
     int rc = 1;
-    Py_Initialize ();
 
     try
       {
@@ -127,7 +136,7 @@ namespace
                      boost::python::object &py_global)
   {
     // Import the YouTube proxy module
-    py_main = bp::import ("tizyoutubeproxy");
+    py_main = import_proxy_module ("tizyoutubeproxy");
 
     // Retrieve the main module's namespace
     py_global = py_main.attr ("__dict__");
@@ -142,42 +151,45 @@ namespace
 }
 
 tizyoutube::tizyoutube ()
-  : current_url_ (),
-    current_stream_index_ (),
-    current_queue_length_ (),
-    current_stream_title_ (),
-    current_stream_author_ (),
-    current_stream_file_size_ (),
-    current_stream_duration_ (),
-    current_stream_bitrate_ (),
-    current_stream_view_count_ (),
-    current_stream_description_ (),
-    current_stream_file_extension_ (),
-    current_stream_video_id_ (),
-    current_stream_published_ (),
+  : worker_ (),
+    worker_running_ (false),
+    stopping_ (false),
+    commands_ (),
+    completions_ (),
+    worker_stream_ (),
+    completed_stream_ (),
+    stream_completed_ (false),
+    stream_ (),
     current_queue_progress_ ()
 {
+  completion_fds_[0] = -1;
+  completion_fds_[1] = -1;
+  pthread_mutex_init (&mutex_, NULL);
+  pthread_cond_init (&work_cond_, NULL);
+  pthread_cond_init (&done_cond_, NULL);
 }
 
 tizyoutube::~tizyoutube ()
 {
+  stop_worker ();
+  pthread_cond_destroy (&done_cond_);
+  pthread_cond_destroy (&work_cond_);
+  pthread_mutex_destroy (&mutex_);
 }
 
 int tizyoutube::init ()
 {
-  int rc = 0;
-  if (0 == (rc = check_deps ()))
+  int rc = start_worker ();
+  if (!rc)
     {
-      try_catch_wrapper (init_youtube (py_main_, py_global_));
+      rc = run_command (boost::bind (&tizyoutube::import_proxy, this));
     }
   return rc;
 }
 
 int tizyoutube::start ()
 {
-  int rc = 0;
-  try_catch_wrapper (start_youtube (py_global_, py_yt_proxy_));
-  return rc;
+  return run_command (boost::bind (&tizyoutube::create_proxy, this));
 }
 
 void tizyoutube::stop ()
@@ -190,138 +202,127 @@ void tizyoutube::stop ()
 void tizyoutube::deinit ()
 {
   // boost::python doesn't support Py_Finalize() yet!
+  stop_worker ();
 }
 
 int tizyoutube::play_audio_stream (const std::string &url_or_id)
 {
-  int rc = 0;
-  try_catch_wrapper (
-      py_yt_proxy_.attr ("enqueue_audio_stream") (bp::object (url_or_id)));
-  return rc;
+  return run_command (make_command (CommandPlayAudioStream, url_or_id, false));
 }
 
 int tizyoutube::play_audio_playlist (const std::string &url_or_id)
 {
-  int rc = 0;
-  try_catch_wrapper (
-      py_yt_proxy_.attr ("enqueue_audio_playlist") (bp::object (url_or_id)));
-  return rc;
+  return run_command (
+      make_command (CommandPlayAudioPlaylist, url_or_id, false));
 }
 
 int tizyoutube::play_audio_mix (const std::string &url_or_id)
 {
-  int rc = 0;
-  try_catch_wrapper (
-      py_yt_proxy_.attr ("enqueue_audio_mix") (bp::object (url_or_id)));
-  return rc;
+  return run_command (make_command (CommandPlayAudioMix, url_or_id, false));
 }
 
 int tizyoutube::play_audio_search (const std::string &search)
 {
-  int rc = 0;
-  try_catch_wrapper (
-      py_yt_proxy_.attr ("enqueue_audio_search") (bp::object (search)));
-  return rc;
+  return run_command (make_command (CommandPlayAudioSearch, search, false));
 }
 
 int tizyoutube::play_audio_mix_search (const std::string &search)
 {
-  int rc = 0;
-  try_catch_wrapper (
-      py_yt_proxy_.attr ("enqueue_audio_mix_search") (bp::object (search)));
-  return rc;
+  return run_command (make_command (CommandPlayAudioMixSearch, search, false));
 }
 
 int tizyoutube::play_audio_channel_uploads (const std::string &channel)
 {
-  int rc = 0;
-  try_catch_wrapper (
-      py_yt_proxy_.attr ("enqueue_audio_channel_uploads") (bp::object (channel)));
-  return rc;
+  return run_command (
+      make_command (CommandPlayAudioChannelUploads, channel, false));
 }
 
 int tizyoutube::play_audio_channel_playlist (
     const std::string &channel_and_playlist)
 {
-  int rc = 0;
-  std::string ch_and_pl_trim = channel_and_playlist;
-  std::vector< std::string > strs;
-  boost::algorithm::trim_all (ch_and_pl_trim);
-  boost::split (strs, ch_and_pl_trim, boost::is_any_of (" "));
-  if (strs.size () <= 1)
-    {
-      rc = 1;
-    }
-  else
-    {
-      std::string channel = strs[0];
-      strs.erase (strs.begin ());
-      std::string playlist = boost::algorithm::join (strs, " ");
-      try_catch_wrapper (py_yt_proxy_.attr ("enqueue_audio_channel_playlist") (
-          bp::object (channel), bp::object (playlist)));
-    }
-  return rc;
+  return run_command (make_command (CommandPlayAudioChannelPlaylist,
+                                    channel_and_playlist, false));
 }
 
 const char *tizyoutube::get_next_url (const bool a_remove_current_url)
 {
-  current_url_.clear ();
-  try
+  (void)run_command (
+      make_command (CommandNextUrl, std::string (), a_remove_current_url));
+  return get_current_url ();
+}
+
+const char *tizyoutube::get_prev_url (const bool a_remove_current_url)
+{
+  (void)run_command (
+      make_command (CommandPrevUrl, std::string (), a_remove_current_url));
+  return get_current_url ();
+}
+
+const char *tizyoutube::get_current_url ()
+{
+  return stream_.url_.empty () ? NULL : stream_.url_.c_str ();
+}
+
+int tizyoutube::post_command (const command cmd, const std::string &arg,
+                              const bool a_remove_current_url)
+{
+  int rc = 1;
+  const command_fn fn = make_command (cmd, arg, a_remove_current_url);
+  if (!fn.empty ())
     {
-      if (a_remove_current_url)
+      pending_command_ptr p_cmd (new pending_command (fn, cmd, true));
+      pthread_mutex_lock (&mutex_);
+      if (worker_running_ && !stopping_)
         {
-          py_yt_proxy_.attr ("remove_current_url") ();
+          commands_.push_back (p_cmd);
+          pthread_cond_signal (&work_cond_);
+          rc = 0;
         }
-      current_url_ = bp::extract< std::string > (py_yt_proxy_.attr ("next_url") ());
-      get_current_stream ();
-    }
-  catch (bp::error_already_set &e)
-    {
-      PyErr_PrintEx (0);
+      pthread_mutex_unlock (&mutex_);
     }
-  catch (...)
-    {
-    }
-  return current_url_.empty () ? NULL : current_url_.c_str ();
+  return rc;
 }
 
-const char *tizyoutube::get_prev_url (const bool a_remove_current_url)
+int tizyoutube::get_completion_fd () const
 {
-  current_url_.clear ();
-  try
+  return completion_fds_[0];
+}
+
+int tizyoutube::get_completion (command &cmd, int &rc)
+{
+  int result = 1;
+  char token = 0;
+  // There is one token in the pipe per completion queued
+  if (completion_fds_[0] >= 0 && 1 == read (completion_fds_[0], &token, 1))
     {
-      if (a_remove_current_url)
+      pthread_mutex_lock (&mutex_);
+      if (!completions_.empty ())
         {
-          py_yt_proxy_.attr ("remove_current_url") ();
+          cmd = completions_.front ().first;
+          rc = completions_.front ().second;
+          completions_.pop_front ();
+          adopt_completed_stream ();
+          result = 0;
         }
-      current_url_ = bp::extract< std::string > (py_yt_proxy_.attr ("prev_url") ());
-      get_current_stream ();
-    }
-  catch (bp::error_already_set &e)
-    {
-      PyErr_PrintEx (0);
+      pthread_mutex_unlock (&mutex_);
     }
-  catch (...)
-    {
-    }
-  return current_url_.empty () ? NULL : current_url_.c_str ();
+  return result;
 }
 
 void tizyoutube::clear_queue ()
 {
-  int rc = 0;
-  try_catch_wrapper (py_yt_proxy_.attr ("clear_queue") ());
-  (void)rc;
+  (void)run_command (boost::bind (&tizyoutube::clear_proxy_queue, this));
 }
 
 const char *tizyoutube::get_current_audio_stream_index ()
 {
-  return current_stream_index_.empty () ? NULL : current_stream_index_.c_str ();
+  return stream_.index_.empty () ? NULL : stream_.index_.c_str ();
 }
 
 const char *tizyoutube::get_current_queue_length ()
 {
-  return current_queue_length_.empty () ? NULL : current_queue_length_.c_str ();
+  return stream_.queue_length_.empty () ? NULL
+                                        : stream_.queue_length_.c_str ();
 }
 
 const char *tizyoutube::get_current_queue_progress ()
@@ -334,17 +335,18 @@ const char *tizyoutube::get_current_queue_progress ()
 
 void tizyoutube::set_playback_mode (const playback_mode mode)
 {
-  int rc = 0;
   switch (mode)
     {
       case PlaybackModeNormal:
         {
-          try_catch_wrapper (py_yt_proxy_.attr ("set_play_mode") ("NORMAL"));
+          (void)run_command (boost::bind (&tizyoutube::set_play_mode, this,
+                                          std::string ("NORMAL")));
         }
         break;
       case PlaybackModeShuffle:
         {
-          try_catch_wrapper (py_yt_proxy_.attr ("set_play_mode") ("SHUFFLE"));
+          (void)run_command (boost::bind (&tizyoutube::set_play_mode, this,
+                                          std::string ("SHUFFLE")));
         }
         break;
       default:
@@ -353,111 +355,95 @@ void tizyoutube::set_playback_mode (const playback_mode mode)
         }
         break;
     };
-  (void)rc;
 }
 
 const char *tizyoutube::get_current_audio_stream_title ()
 {
-  return current_stream_title_.empty () ? NULL : current_stream_title_.c_str ();
+  return stream_.title_.empty () ? NULL : stream_.title_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_author ()
 {
-  return current_stream_author_.empty () ? NULL
-                                         : current_stream_author_.c_str ();
+  return stream_.author_.empty () ? NULL : stream_.author_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_file_size ()
 {
-  return current_stream_file_size_.empty ()
-             ? NULL
-             : current_stream_file_size_.c_str ();
+  return stream_.file_size_.empty () ? NULL : stream_.file_size_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_duration ()
 {
-  return current_stream_duration_.empty () ? NULL
-                                           : current_stream_duration_.c_str ();
+  return stream_.duration_.empty () ? NULL : stream_.duration_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_bitrate ()
 {
-  return current_stream_bitrate_.empty () ? NULL
-                                          : current_stream_bitrate_.c_str ();
+  return stream_.bitrate_.empty () ? NULL : stream_.bitrate_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_view_count ()
 {
-  return current_stream_view_count_.empty ()
-             ? NULL
-             : current_stream_view_count_.c_str ();
+  return stream_.view_count_.empty () ? NULL : stream_.view_count_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_description ()
 {
-  return current_stream_description_.empty ()
-             ? NULL
-             : current_stream_description_.c_str ();
+  return stream_.description_.empty () ? NULL : stream_.description_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_file_extension ()
 {
-  return current_stream_file_extension_.empty ()
-             ? NULL
-             : current_stream_file_extension_.c_str ();
+  return stream_.file_extension_.empty () ? NULL
+                                          : stream_.file_extension_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_video_id ()
 {
-  return current_stream_video_id_.empty () ? NULL
-                                           : current_stream_video_id_.c_str ();
+  return stream_.video_id_.empty () ? NULL : stream_.video_id_.c_str ();
 }
 
 const char *tizyoutube::get_current_audio_stream_published ()
 {
-  return current_stream_published_.empty ()
-             ? NULL
-             : current_stream_published_.c_str ();
+  return stream_.published_.empty () ? NULL : stream_.published_.c_str ();
 }
 
 void tizyoutube::get_current_stream ()
 {
-  current_stream_index_.clear ();
-  current_queue_length_.clear ();
-  current_stream_title_.clear ();
-  current_stream_author_.clear ();
-  current_stream_file_size_.clear ();
-  current_stream_duration_.clear ();
-  current_stream_bitrate_.clear ();
-  current_stream_view_count_.clear ();
-  current_stream_description_.clear ();
-  current_stream_file_extension_.clear ();
-  current_stream_video_id_.clear ();
-  current_stream_published_.clear ();
-
-  const bp::tuple &queue_info = bp::extract< bp::tuple > (py_yt_proxy_.attr (
-      "current_audio_stream_queue_index_and_queue_length") ());
-  const int queue_index = bp::extract< int > (queue_info[0]);
-  const int queue_length = bp::extract< int > (queue_info[1]);
-  current_stream_index_.assign (
+  worker_stream_.index_.clear ();
+  worker_stream_.queue_length_.clear ();
+  worker_stream_.title_.clear ();
+  worker_stream_.author_.clear ();
+  worker_stream_.file_size_.clear ();
+  worker_stream_.duration_.clear ();
+  worker_stream_.bitrate_.clear ();
+  worker_stream_.view_count_.clear ();
+  worker_stream_.description_.clear ();
+  worker_stream_.file_extension_.clear ();
+  worker_stream_.video_id_.clear ();
+  worker_stream_.published_.clear ();
+
+  // Retrieve all the stream's metadata with a single call into the proxy
+  const bp::tuple &metadata = bp::extract< bp::tuple > (
+      py_yt_proxy_.attr ("current_audio_stream_metadata") ());
+
+  const int queue_index = bp::extract< int > (metadata[0]);
+  const int queue_length = bp::extract< int > (metadata[1]);
+  worker_stream_.index_.assign (
       boost::lexical_cast< std::string > (queue_index));
-  current_queue_length_.assign (
+  worker_stream_.queue_length_.assign (
       boost::lexical_cast< std::string > (queue_length));
 
-  current_stream_title_ = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_title") ());
+  worker_stream_.title_ = bp::extract< std::string > (metadata[2]);
 
-  current_stream_author_ = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_author") ());
+  worker_stream_.author_ = bp::extract< std::string > (metadata[3]);
 
-  const int file_size = bp::extract< int > (
-      py_yt_proxy_.attr ("current_audio_stream_file_size") ());
-  current_stream_file_size_.assign (
+  const int file_size = bp::extract< int > (metadata[4]);
+  worker_stream_.file_size_.assign (
       boost::lexical_cast< std::string > (file_size / (1024 * 1024)));
-  current_stream_file_size_.append (" MiB");
+  worker_stream_.file_size_.append (" MiB");
 
-  std::string duration = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_duration") ());
+  std::string duration = bp::extract< std::string > (metadata[5]);
   if (duration.length())
     {
       std::string value = duration;
@@ -493,44 +479,351 @@ void tizyoutube::get_current_stream ()
 
       for (size_t i = 0; i < num_non_empty; ++i)
         {
-          current_stream_duration_ =  strs[i] + current_stream_duration_;
+          worker_stream_.duration_ =  strs[i] + worker_stream_.duration_;
           if ((num_non_empty - 1) != i)
             {
-              current_stream_duration_ = ":" + current_stream_duration_;
+              worker_stream_.duration_ = ":" + worker_stream_.duration_;
             }
         }
     }
 
-  current_stream_bitrate_ = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_bitrate") ());
+  worker_stream_.bitrate_ = bp::extract< std::string > (metadata[6]);
 
-  const int view_count = bp::extract< int > (
-      py_yt_proxy_.attr ("current_audio_stream_view_count") ());
-  current_stream_view_count_.assign (
+  const int view_count = bp::extract< int > (metadata[7]);
+  worker_stream_.view_count_.assign (
       boost::lexical_cast< std::string > (view_count));
 
-  std::string description = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_description") ());
+  std::string description = bp::extract< std::string > (metadata[8]);
   if (description.length())
     {
-      current_stream_description_ = description;
-      current_stream_description_.erase (
-          std::remove (current_stream_description_.begin (),
-                       current_stream_description_.end (), '\n'),
-          current_stream_description_.end ());
-      current_stream_description_.erase (
-          std::remove (current_stream_description_.begin (),
-                       current_stream_description_.end (), '\r'),
-          current_stream_description_.end ());
+      worker_stream_.description_ = description;
+      worker_stream_.description_.erase (
+          std::remove (worker_stream_.description_.begin (),
+                       worker_stream_.description_.end (), '\n'),
+          worker_stream_.description_.end ());
+      worker_stream_.description_.erase (
+          std::remove (worker_stream_.description_.begin (),
+                       worker_stream_.description_.end (), '\r'),
+          worker_stream_.description_.end ());
+    }
+
+  worker_stream_.file_extension_ = bp::extract< std::string > (metadata[9]);
+
+  worker_stream_.video_id_ = bp::extract< std::string > (metadata[10]);
+
+  worker_stream_.published_ = bp::extract< std::string > (metadata[11]);
+
+}
+
+void *tizyoutube::worker_thread (void *ap_arg)
+{
+  tizyoutube *p_yt = static_cast< tizyoutube * > (ap_arg);
+  assert (p_yt);
+  p_yt->worker_loop ();
+  return NULL;
+}
+
+void tizyoutube::worker_loop ()
+{
+  // All interactions with the Python proxy happen in this thread
+  init_python ();
+
+  for (;;)
+    {
+      pending_command_ptr p_cmd;
+
+      pthread_mutex_lock (&mutex_);
+      while (!stopping_ && commands_.empty ())
+        {
+          pthread_cond_wait (&work_cond_, &mutex_);
+        }
+      if (!commands_.empty ())
+        {
+          p_cmd = commands_.front ();
+          commands_.pop_front ();
+        }
+      pthread_mutex_unlock (&mutex_);
+
+      if (!p_cmd)
+        {
+          // Stopping, and there is nothing left to process
+          break;
+        }
+
+      int rc = 1;
+      {
+        const gil_guard gil;
+        rc = p_cmd->fn_ ();
+      }
+      complete_command (p_cmd, rc);
+    }
+
+  // Drop the references to the Python objects while holding the GIL
+  const gil_guard gil;
+  py_yt_proxy_ = bp::object ();
+  py_global_ = bp::object ();
+  py_main_ = bp::object ();
+}
+
+int tizyoutube::start_worker ()
+{
+  int rc = 1;
+  if (0 == pipe (completion_fds_))
+    {
+      // The read end is meant to be polled from the client's event loop
+      (void)fcntl (completion_fds_[0], F_SETFL, O_NONBLOCK);
+      (void)fcntl (completion_fds_[0], F_SETFD, FD_CLOEXEC);
+      (void)fcntl (completion_fds_[1], F_SETFD, FD_CLOEXEC);
+      if (0 == pthread_create (&worker_, NULL, &tizyoutube::worker_thread,
+                               this))
+        {
+          worker_running_ = true;
+          rc = 0;
+        }
+    }
+  else
+    {
+      completion_fds_[0] = -1;
+      completion_fds_[1] = -1;
+    }
+  return rc;
+}
+
+void tizyoutube::stop_worker ()
+{
+  pthread_mutex_lock (&mutex_);
+  const bool running = worker_running_;
+  stopping_ = true;
+  pthread_cond_signal (&work_cond_);
+  pthread_mutex_unlock (&mutex_);
+
+  if (running)
+    {
+      pthread_join (worker_, NULL);
+      worker_running_ = false;
+    }
+
+  for (int i = 0; i < 2; ++i)
+    {
+      if (completion_fds_[i] >= 0)
+        {
+          close (completion_fds_[i]);
+          completion_fds_[i] = -1;
+        }
+    }
+}
+
+int tizyoutube::run_command (const command_fn &fn)
+{
+  int rc = 1;
+  if (!fn.empty ())
+    {
+      pending_command_ptr p_cmd (new pending_command (fn, CommandMax, false));
+      pthread_mutex_lock (&mutex_);
+      if (worker_running_ && !stopping_)
+        {
+          commands_.push_back (p_cmd);
+          pthread_cond_signal (&work_cond_);
+          while (!p_cmd->done_)
+            {
+              pthread_cond_wait (&done_cond_, &mutex_);
+            }
+          rc = p_cmd->rc_;
+          adopt_completed_stream ();
+        }
+      pthread_mutex_unlock (&mutex_);
+    }
+  return rc;
+}
+
+tizyoutube::command_fn tizyoutube::make_command (
+    const command cmd, const std::string &arg, const bool a_remove_current_url)
+{
+  command_fn fn;
+  switch (cmd)
+    {
+      case CommandPlayAudioStream:
+        {
+          fn = boost::bind (&tizyoutube::enqueue, this,
+                            std::string ("enqueue_audio_stream"), arg);
+        }
+        break;
+      case CommandPlayAudioPlaylist:
+        {
+          fn = boost::bind (&tizyoutube::enqueue, this,
+                            std::string ("enqueue_audio_playlist"), arg);
+        }
+        break;
+      case CommandPlayAudioMix:
+        {
+          fn = boost::bind (&tizyoutube::enqueue, this,
+                            std::string ("enqueue_audio_mix"), arg);
+        }
+        break;
+      case CommandPlayAudioSearch:
+        {
+          fn = boost::bind (&tizyoutube::enqueue, this,
+                            std::string ("enqueue_audio_search"), arg);
+        }
+        break;
+      case CommandPlayAudioMixSearch:
+        {
+          fn = boost::bind (&tizyoutube::enqueue, this,
+                            std::string ("enqueue_audio_mix_search"), arg);
+        }
+        break;
+      case CommandPlayAudioChannelUploads:
+        {
+          fn = boost::bind (&tizyoutube::enqueue, this,
+                            std::string ("enqueue_audio_channel_uploads"),
+                            arg);
+        }
+        break;
+      case CommandPlayAudioChannelPlaylist:
+        {
+          fn = boost::bind (&tizyoutube::enqueue_channel_playlist, this, arg);
+        }
+        break;
+      case CommandNextUrl:
+        {
+          fn = boost::bind (&tizyoutube::obtain_url, this,
+                            std::string ("next_url"), a_remove_current_url);
+        }
+        break;
+      case CommandPrevUrl:
+        {
+          fn = boost::bind (&tizyoutube::obtain_url, this,
+                            std::string ("prev_url"), a_remove_current_url);
+        }
+        break;
+      default:
+        {
+          assert (0);
+        }
+        break;
+    };
+  return fn;
+}
+
+void tizyoutube::complete_command (const pending_command_ptr &p_cmd,
+                                   const int rc)
+{
+  pthread_mutex_lock (&mutex_);
+  p_cmd->rc_ = rc;
+  p_cmd->done_ = true;
+  if (p_cmd->async_)
+    {
+      const char token = 0;
+      completions_.push_back (completion (p_cmd->cmd_, rc));
+      if (1 != write (completion_fds_[1], &token, 1))
+        {
+          std::cerr << std::string ("Unable to signal command completion");
+        }
+    }
+  else
+    {
+      pthread_cond_broadcast (&done_cond_);
+    }
+  pthread_mutex_unlock (&mutex_);
+}
+
+void tizyoutube::adopt_completed_stream ()
+{
+  // The caller holds mutex_. The stream strings returned by the getters are
+  // only ever modified here, in the client's thread.
+  if (stream_completed_)
+    {
+      stream_ = completed_stream_;
+      stream_completed_ = false;
+    }
+}
+
+int tizyoutube::import_proxy ()
+{
+  int rc = 0;
+  if (0 == (rc = check_deps ()))
+    {
+      try_catch_wrapper (init_youtube (py_main_, py_global_));
     }
+  return rc;
+}
+
+int tizyoutube::create_proxy ()
+{
+  int rc = 0;
+  try_catch_wrapper (start_youtube (py_global_, py_yt_proxy_));
+  return rc;
+}
+
+int tizyoutube::enqueue (const std::string &method, const std::string &arg)
+{
+  int rc = 0;
+  try_catch_wrapper (py_yt_proxy_.attr (method.c_str ()) (bp::object (arg)));
+  return rc;
+}
 
-  current_stream_file_extension_ = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_file_extension") ());
+int tizyoutube::enqueue_channel_playlist (
+    const std::string &channel_and_playlist)
+{
+  int rc = 0;
+  std::string ch_and_pl_trim = channel_and_playlist;
+  std::vector< std::string > strs;
+  boost::algorithm::trim_all (ch_and_pl_trim);
+  boost::split (strs, ch_and_pl_trim, boost::is_any_of (" "));
+  if (strs.size () <= 1)
+    {
+      rc = 1;
+    }
+  else
+    {
+      std::string channel = strs[0];
+      strs.erase (strs.begin ());
+      std::string playlist = boost::algorithm::join (strs, " ");
+      try_catch_wrapper (py_yt_proxy_.attr ("enqueue_audio_channel_playlist") (
+          bp::object (channel), bp::object (playlist)));
+    }
+  return rc;
+}
 
-  current_stream_video_id_ = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_video_id") ());
+int tizyoutube::obtain_url (const std::string &method,
+                            const bool a_remove_current_url)
+{
+  worker_stream_.url_.clear ();
+  try
+    {
+      if (a_remove_current_url)
+        {
+          py_yt_proxy_.attr ("remove_current_url") ();
+        }
+      worker_stream_.url_
+          = bp::extract< std::string > (py_yt_proxy_.attr (method.c_str ()) ());
+      get_current_stream ();
+    }
+  catch (bp::error_already_set &e)
+    {
+      PyErr_PrintEx (0);
+    }
+  catch (...)
+    {
+    }
+  // Hand the stream over to the client's thread (see adopt_completed_stream)
+  pthread_mutex_lock (&mutex_);
+  completed_stream_ = worker_stream_;
+  stream_completed_ = true;
+  pthread_mutex_unlock (&mutex_);
+  return worker_stream_.url_.empty () ? 1 : 0;
+}
 
-  current_stream_published_ = bp::extract< std::string > (
-      py_yt_proxy_.attr ("current_audio_stream_published") ());
+int tizyoutube::set_play_mode (const std::string &mode)
+{
+  int rc = 0;
+  try_catch_wrapper (py_yt_proxy_.attr ("set_play_mode") (bp::object (mode)));
+  return rc;
+}
 
+int tizyoutube::clear_proxy_queue ()
+{
+  int rc = 0;
+  try_catch_wrapper (py_yt_proxy_.attr ("clear_queue") ());
+  return rc;
 }
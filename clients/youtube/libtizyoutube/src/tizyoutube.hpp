@@ -30,8 +30,14 @@
 #define TIZYOUTUBE_HPP
 
 #include <boost/python.hpp>
+#include <boost/function.hpp>
+#include <boost/shared_ptr.hpp>
 
+#include <pthread.h>
+
+#include <deque>
 #include <string>
+#include <utility>
 
 class tizyoutube
 {
@@ -46,6 +52,23 @@ public:
     PlaybackModeMax
   };
 
+  /**
+   * Commands that may be posted asynchronously to the proxy's worker thread.
+   */
+  enum command
+  {
+    CommandPlayAudioStream,
+    CommandPlayAudioPlaylist,
+    CommandPlayAudioMix,
+    CommandPlayAudioSearch,
+    CommandPlayAudioMixSearch,
+    CommandPlayAudioChannelUploads,
+    CommandPlayAudioChannelPlaylist,
+    CommandNextUrl,
+    CommandPrevUrl,
+    CommandMax
+  };
+
 public:
   tizyoutube ();
   ~tizyoutube ();
@@ -71,6 +94,12 @@ public:
 
   const char *get_next_url (const bool a_remove_current_url);
   const char *get_prev_url (const bool a_remove_current_url);
+  const char *get_current_url ();
+
+  int post_command (const command cmd, const std::string &arg,
+                    const bool a_remove_current_url);
+  int get_completion_fd () const;
+  int get_completion (command &cmd, int &rc);
 
   const char *get_current_audio_stream_title ();
   const char *get_current_audio_stream_author ();
@@ -84,22 +113,77 @@ public:
   const char *get_current_audio_stream_published ();
 
 private:
+  typedef boost::function< int() > command_fn;
+
+  struct pending_command
+  {
+    pending_command (const command_fn &fn, const command cmd,
+                     const bool async)
+      : fn_ (fn), cmd_ (cmd), async_ (async), done_ (false), rc_ (1)
+    {
+    }
+
+    command_fn fn_;
+    command cmd_;
+    bool async_;
+    bool done_;
+    int rc_;
+  };
+  typedef boost::shared_ptr< pending_command > pending_command_ptr;
+  typedef std::pair< command, int > completion;
+
+  // The url and metadata of a stream, as strings
+  struct stream_info
+  {
+    std::string url_;
+    std::string index_;
+    std::string queue_length_;
+    std::string title_;
+    std::string author_;
+    std::string file_size_;
+    std::string duration_;
+    std::string bitrate_;
+    std::string view_count_;
+    std::string description_;
+    std::string file_extension_;
+    std::string video_id_;
+    std::string published_;
+  };
+
+private:
+  static void *worker_thread (void *ap_arg);
+  void worker_loop ();
+  int start_worker ();
+  void stop_worker ();
+  int run_command (const command_fn &fn);
+  command_fn make_command (const command cmd, const std::string &arg,
+                           const bool a_remove_current_url);
+  void complete_command (const pending_command_ptr &p_cmd, const int rc);
+  void adopt_completed_stream ();
+
+  int import_proxy ();
+  int create_proxy ();
+  int enqueue (const std::string &method, const std::string &arg);
+  int enqueue_channel_playlist (const std::string &channel_and_playlist);
+  int obtain_url (const std::string &method, const bool a_remove_current_url);
+  int set_play_mode (const std::string &mode);
+  int clear_proxy_queue ();
   void get_current_stream ();
 
 private:
-  std::string current_url_;
-  std::string current_stream_index_;
-  std::string current_queue_length_;
-  std::string current_stream_title_;
-  std::string current_stream_author_;
-  std::string current_stream_file_size_;
-  std::string current_stream_duration_;
-  std::string current_stream_bitrate_;
-  std::string current_stream_view_count_;
-  std::string current_stream_description_;
-  std::string current_stream_file_extension_;
-  std::string current_stream_video_id_;
-  std::string current_stream_published_;
+  pthread_t worker_;
+  bool worker_running_;
+  bool stopping_;
+  pthread_mutex_t mutex_;
+  pthread_cond_t work_cond_;
+  pthread_cond_t done_cond_;
+  std::deque< pending_command_ptr > commands_;
+  std::deque< completion > completions_;
+  int completion_fds_[2];
+  stream_info worker_stream_;    // Only used by the worker thread
+  stream_info completed_stream_; // Protected by mutex_
+  bool stream_completed_;
+  stream_info stream_;           // Only used by the client's thread
   std::string current_queue_progress_;
   boost::python::object py_main_;
   boost::python::object py_global_;
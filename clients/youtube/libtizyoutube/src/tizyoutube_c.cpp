@@ -209,6 +209,51 @@ extern "C" const char *tiz_youtube_get_prev_url (
   return ap_youtube->p_proxy_->get_prev_url (a_remove_current_url);
 }
 
+extern "C" const char *tiz_youtube_get_current_url (tiz_youtube_t *ap_youtube)
+{
+  assert (ap_youtube);
+  assert (ap_youtube->p_proxy_);
+  return ap_youtube->p_proxy_->get_current_url ();
+}
+
+extern "C" int tiz_youtube_post_command (tiz_youtube_t *ap_youtube,
+                                         const tiz_youtube_command_t a_cmd,
+                                         const char *ap_arg,
+                                         const bool a_remove_current_url)
+{
+  assert (ap_youtube);
+  assert (ap_youtube->p_proxy_);
+  return ap_youtube->p_proxy_->post_command (
+      static_cast< tizyoutube::command > (a_cmd),
+      ap_arg ? ap_arg : std::string (), a_remove_current_url);
+}
+
+extern "C" int tiz_youtube_get_completion_fd (tiz_youtube_t *ap_youtube)
+{
+  assert (ap_youtube);
+  assert (ap_youtube->p_proxy_);
+  return ap_youtube->p_proxy_->get_completion_fd ();
+}
+
+extern "C" int tiz_youtube_get_completion (tiz_youtube_t *ap_youtube,
+                                           tiz_youtube_command_t *ap_cmd,
+                                           int *ap_rc)
+{
+  int rc = 1;
+  tizyoutube::command cmd = tizyoutube::CommandMax;
+  int cmd_rc = 1;
+  assert (ap_youtube);
+  assert (ap_youtube->p_proxy_);
+  assert (ap_cmd);
+  assert (ap_rc);
+  if (0 == (rc = ap_youtube->p_proxy_->get_completion (cmd, cmd_rc)))
+    {
+      *ap_cmd = static_cast< tiz_youtube_command_t > (cmd);
+      *ap_rc = cmd_rc;
+    }
+  return rc;
+}
+
 extern "C" const char *tiz_youtube_get_current_audio_stream_title (
     tiz_youtube_t *ap_youtube)
 {
@@ -61,6 +61,23 @@ typedef enum tiz_youtube_playback_mode {
   ETIZYoutubePlaybackModeMax
 } tiz_youtube_playback_mode_t;
 
+/**
+ * Commands that may be posted asynchronously with tiz_youtube_post_command.
+ * @ingroup libtizyoutube
+ */
+typedef enum tiz_youtube_command {
+  ETIZYoutubeCommandPlayAudioStream,
+  ETIZYoutubeCommandPlayAudioPlaylist,
+  ETIZYoutubeCommandPlayAudioMix,
+  ETIZYoutubeCommandPlayAudioSearch,
+  ETIZYoutubeCommandPlayAudioMixSearch,
+  ETIZYoutubeCommandPlayAudioChannelUploads,
+  ETIZYoutubeCommandPlayAudioChannelPlaylist,
+  ETIZYoutubeCommandNextUrl,
+  ETIZYoutubeCommandPrevUrl,
+  ETIZYoutubeCommandMax
+} tiz_youtube_command_t;
+
 /**
  * Initialize the tiz_youtube handle.
  *
@@ -271,6 +288,72 @@ const char *tiz_youtube_get_next_url (tiz_youtube_t *ap_youtube,
 const char *tiz_youtube_get_prev_url (tiz_youtube_t *ap_youtube,
                                       const bool a_remove_current_url);
 
+/**
+ * Retrieve the url selected by the last next/prev url command.
+ *
+ * @ingroup libtizyoutube
+ *
+ * @param ap_youtube The tiz_youtube handle.
+ *
+ * @return The current url or NULL if the playback queue is empty.
+ */
+const char *tiz_youtube_get_current_url (tiz_youtube_t *ap_youtube);
+
+/**
+ * Post a command to the handle's worker thread and return immediately.
+ *
+ * All calls into the YouTube proxy are executed in a dedicated thread, which
+ * holds the Python GIL only while a command is in progress. The synchronous
+ * functions in this API simply wait for their command to finish. A posted
+ * command instead signals its completion through the file descriptor returned
+ * by tiz_youtube_get_completion_fd; the result is then retrieved with
+ * tiz_youtube_get_completion. Commands are processed in order.
+ *
+ * The url and metadata getters must not be used while a next/prev url
+ * command is in progress.
+ *
+ * @ingroup libtizyoutube
+ *
+ * @param ap_youtube The tiz_youtube handle.
+ * @param a_cmd The command.
+ * @param ap_arg The command's argument (url, id, search terms, etc); ignored
+ * by the next/prev url commands.
+ * @param a_remove_current_url Only used by the next/prev url commands. If
+ * true, delete the current url from the playback queue before moving.
+ *
+ * @return 0 if the command has been queued.
+ */
+int tiz_youtube_post_command (tiz_youtube_t *ap_youtube,
+                              const tiz_youtube_command_t a_cmd,
+                              const char *ap_arg,
+                              const bool a_remove_current_url);
+
+/**
+ * Retrieve the file descriptor that becomes readable when a posted command
+ * completes.
+ *
+ * @ingroup libtizyoutube
+ *
+ * @param ap_youtube The tiz_youtube handle.
+ *
+ * @return A non-blocking file descriptor, owned by the handle.
+ */
+int tiz_youtube_get_completion_fd (tiz_youtube_t *ap_youtube);
+
+/**
+ * Retrieve the result of the oldest posted command that has completed.
+ *
+ * @ingroup libtizyoutube
+ *
+ * @param ap_youtube The tiz_youtube handle.
+ * @param ap_cmd On return, the command that completed.
+ * @param ap_rc On return, the command's result (0 on success).
+ *
+ * @return 0 if a completion was retrieved, non-zero if none is pending.
+ */
+int tiz_youtube_get_completion (tiz_youtube_t *ap_youtube,
+                                tiz_youtube_command_t *ap_cmd, int *ap_rc);
+
 /**
  * Retrieve the current audio stream's title.
  *
@@ -0,0 +1,101 @@
+/**
+ * Copyright (C) 2011-2019 Aratelia Limited - Juan A. Rubio
+ *
+ * This file is part of Tizonia
+ *
+ * Tizonia is free software: you can redistribute it and/or modify it under the
+ * terms of the GNU Lesser General Public License as published by the Free
+ * Software Foundation, either version 3 of the License, or (at your option)
+ * any later version.
+ *
+ * Tizonia is distributed in the hope that it will be useful, but WITHOUT ANY
+ * WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS
+ * FOR A PARTICULAR PURPOSE.  See the GNU Lesser General Public License for
+ * more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public License
+ * along with Tizonia.  If not, see <http://www.gnu.org/licenses/>.
+ */
+
+/**
+ * @file   tizpyproxy.hpp
+ * @author Juan A. Rubio <juan.rubio@aratelia.com>
+ *
+ * @brief  Tizonia - Helpers shared by the Python proxy client libraries
+ *
+ *
+ */
+
+#ifndef TIZPYPROXY_HPP
+#define TIZPYPROXY_HPP
+
+#include <boost/python.hpp>
+
+#include <stdlib.h>
+
+namespace tiz
+{
+  namespace python
+  {
+    /* Holds the GIL for the lifetime of the object */
+    class gil_guard
+    {
+    public:
+      gil_guard () : state_ (PyGILState_Ensure ())
+      {
+      }
+
+      ~gil_guard ()
+      {
+        PyGILState_Release (state_);
+      }
+
+    private:
+      gil_guard (const gil_guard &);
+      gil_guard &operator= (const gil_guard &);
+
+    private:
+      PyGILState_STATE state_;
+    };
+
+    /* Initialises the interpreter, once per process. */
+    inline void init_python ()
+    {
+      if (!Py_IsInitialized ())
+        {
+          Py_Initialize ();
+#if PY_VERSION_HEX < 0x03070000
+          PyEval_InitThreads ();
+#endif
+          // Py_Initialize returns with the GIL held by the calling thread;
+          // release it, so that it is only taken while a proxy call is in
+          // progress. This lets the proxies' own Python threads run freely
+          // in between calls.
+          (void)PyEval_SaveThread ();
+        }
+    }
+
+    /* Imports a proxy module. Must be called with the GIL held. */
+    inline boost::python::object import_proxy_module (const char *ap_name)
+    {
+      const char *p_daemon = getenv ("TIZONIA_PROXY_DAEMON");
+      if (p_daemon && *p_daemon)
+        {
+          try
+            {
+              // Use the proxy hosted by the shared proxy daemon. This falls
+              // back to the local module if the daemon can't be reached.
+              return boost::python::import ("tizproxyd")
+                  .attr ("client_module") (ap_name);
+            }
+          catch (boost::python::error_already_set &e)
+            {
+              PyErr_PrintEx (0);
+            }
+        }
+      return boost::python::import (ap_name);
+    }
+  }  // namespace python
+}  // namespace tiz
+
+#endif  // TIZPYPROXY_HPP
@@ -412,13 +412,12 @@ update_metadata (youtube_prc_t * ap_prc)
 }
 
 static OMX_ERRORTYPE
-obtain_next_url (youtube_prc_t * ap_prc, int a_skip_value)
+store_next_url (youtube_prc_t * ap_prc, const char * ap_next_url)
 {
   OMX_ERRORTYPE rc = OMX_ErrorNone;
   const long pathname_max = PATH_MAX + NAME_MAX;
 
   assert (ap_prc);
-  assert (ap_prc->p_youtube_);
 
   if (!ap_prc->p_uri_param_)
     {
@@ -432,37 +431,131 @@ obtain_next_url (youtube_prc_t * ap_prc, int a_skip_value)
     = sizeof (OMX_PARAM_CONTENTURITYPE) + pathname_max + 1;
   ap_prc->p_uri_param_->nVersion.nVersion = OMX_VERSION;
 
+  tiz_check_null_ret_oom (ap_next_url);
+
   {
-    const char * p_next_url
-      = a_skip_value > 0 ? tiz_youtube_get_next_url (ap_prc->p_youtube_,
-                                                    ap_prc->remove_current_url_)
-                         : tiz_youtube_get_prev_url (
-                             ap_prc->p_youtube_, ap_prc->remove_current_url_);
-    ap_prc->remove_current_url_ = false;
-    tiz_check_null_ret_oom (p_next_url);
+    const OMX_U32 url_len = strnlen (ap_next_url, pathname_max);
+    TIZ_TRACE (handleOf (ap_prc), "URL [%s]", ap_next_url);
+
+    /* Verify we are getting an http scheme */
+    if (!ap_next_url || !url_len
+        || (strncasecmp (ap_next_url, "http://", 7) != 0
+            && strncasecmp (ap_next_url, "https://", 8) != 0))
+      {
+        rc = OMX_ErrorContentURIError;
+      }
+    else
+      {
+        strncpy ((char *) ap_prc->p_uri_param_->contentURI, ap_next_url,
+                 url_len);
+        ap_prc->p_uri_param_->contentURI[url_len] = '\0';
+
+        /* Song metadata is now available, update the IL client */
+        rc = update_metadata (ap_prc);
+      }
+  }
+
+  return rc;
+}
+
+static OMX_ERRORTYPE
+obtain_next_url (youtube_prc_t * ap_prc, int a_skip_value)
+{
+  const char * p_next_url = NULL;
+
+  assert (ap_prc);
+  assert (ap_prc->p_youtube_);
+
+  p_next_url = a_skip_value > 0
+                 ? tiz_youtube_get_next_url (ap_prc->p_youtube_,
+                                             ap_prc->remove_current_url_)
+                 : tiz_youtube_get_prev_url (ap_prc->p_youtube_,
+                                             ap_prc->remove_current_url_);
+  ap_prc->remove_current_url_ = false;
+  return store_next_url (ap_prc, p_next_url);
+}
+
+static OMX_ERRORTYPE
+request_next_url (youtube_prc_t * ap_prc, int a_skip_value)
+{
+  assert (ap_prc);
+  assert (ap_prc->p_youtube_);
+  assert (ap_prc->p_cmd_ev_io_);
+
+  /* The url is obtained in the youtube client's worker thread; its completion
+     is signalled through the client's completion fd, so that the processor's
+     thread is not blocked while the proxy talks to YouTube. */
+  if (0 != tiz_youtube_post_command (ap_prc->p_youtube_,
+                                     a_skip_value > 0
+                                       ? ETIZYoutubeCommandNextUrl
+                                       : ETIZYoutubeCommandPrevUrl,
+                                     NULL, ap_prc->remove_current_url_))
+    {
+      TIZ_ERROR (handleOf (ap_prc),
+                 "[OMX_ErrorInsufficientResources] : unable to post a "
+                 "command to libtizyoutube");
+      return OMX_ErrorInsufficientResources;
+    }
+  ap_prc->remove_current_url_ = false;
+  ++ap_prc->pending_skips_;
+  return tiz_srv_io_watcher_start (ap_prc, ap_prc->p_cmd_ev_io_);
+}
+
+static OMX_ERRORTYPE
+restart_transfer (youtube_prc_t * ap_prc)
+{
+  assert (ap_prc);
 
+  /* Changing the URL has the side effect of halting the current
+     download */
+  tiz_urltrans_set_uri (ap_prc->p_trans_, ap_prc->p_uri_param_);
+  if (ap_prc->port_disabled_)
     {
-      const OMX_U32 url_len = strnlen (p_next_url, pathname_max);
-      TIZ_TRACE (handleOf (ap_prc), "URL [%s]", p_next_url);
+      /* Record that the URI has changed, so that when the port is
+         re-enabled, we restart the transfer */
+      ap_prc->uri_changed_ = true;
+    }
 
-      /* Verify we are getting an http scheme */
-      if (!p_next_url || !url_len
-          || (strncasecmp (p_next_url, "http://", 7) != 0
-              && strncasecmp (p_next_url, "https://", 8) != 0))
+  /* Get ready to auto-detect another stream */
+  set_auto_detect_on_port (ap_prc);
+  prepare_for_port_auto_detection (ap_prc);
+
+  /* Re-start the transfer */
+  return tiz_urltrans_start (ap_prc->p_trans_);
+}
+
+static OMX_ERRORTYPE
+process_youtube_completions (youtube_prc_t * ap_prc)
+{
+  OMX_ERRORTYPE rc = OMX_ErrorNone;
+  tiz_youtube_command_t cmd = ETIZYoutubeCommandMax;
+  int cmd_rc = 0;
+
+  assert (ap_prc);
+
+  while (0 == tiz_youtube_get_completion (ap_prc->p_youtube_, &cmd, &cmd_rc))
+    {
+      if ((ETIZYoutubeCommandNextUrl == cmd
+           || ETIZYoutubeCommandPrevUrl == cmd)
+          && --ap_prc->pending_skips_ == 0)
         {
-          rc = OMX_ErrorContentURIError;
+          /* Only the last of a burst of skips is acted upon; the url and
+             metadata may not be read while other skips are in progress */
+          TIZ_TRACE (handleOf (ap_prc), "skip completed - rc [%d]", cmd_rc);
+          if (OMX_ErrorNone
+              == store_next_url (ap_prc, tiz_youtube_get_current_url (
+                                           ap_prc->p_youtube_)))
+            {
+              rc = restart_transfer (ap_prc);
+            }
         }
-      else
-        {
-          strncpy ((char *) ap_prc->p_uri_param_->contentURI, p_next_url,
-                   url_len);
-          ap_prc->p_uri_param_->contentURI[url_len] = '\0';
+    }
 
-          /* Song metadata is now available, update the IL client */
-          rc = update_metadata (ap_prc);
-        }
+  if (ap_prc->pending_skips_ > 0)
+    {
+      /* The watcher is level-triggered; re-arm it */
+      rc = tiz_srv_io_watcher_start (ap_prc, ap_prc->p_cmd_ev_io_);
     }
-  }
 
   return rc;
 }
@@ -745,6 +838,8 @@ youtube_prc_ctor (void * ap_obj, va_list * app)
   p_prc->p_uri_param_ = NULL;
   p_prc->p_trans_ = NULL;
   p_prc->p_youtube_ = NULL;
+  p_prc->p_cmd_ev_io_ = NULL;
+  p_prc->pending_skips_ = 0;
   p_prc->eos_ = false;
   p_prc->port_disabled_ = false;
   p_prc->uri_changed_ = false;
@@ -791,6 +886,9 @@ youtube_prc_allocate_resources (void * ap_obj, OMX_U32 a_pid)
 
   tiz_check_omx (enqueue_playlist_items (p_prc));
   tiz_check_omx (obtain_next_url (p_prc, 1));
+  tiz_check_omx (tiz_srv_io_watcher_init (
+    p_prc, &(p_prc->p_cmd_ev_io_),
+    tiz_youtube_get_completion_fd (p_prc->p_youtube_), TIZ_EVENT_READ, true));
 
   {
     const tiz_urltrans_buffer_cbacks_t buffer_cbacks
@@ -822,6 +920,12 @@ youtube_prc_deallocate_resources (void * ap_prc)
   tiz_urltrans_destroy (p_prc->p_trans_);
   p_prc->p_trans_ = NULL;
   delete_uri (p_prc);
+  if (p_prc->p_cmd_ev_io_)
+    {
+      tiz_srv_io_watcher_destroy (p_prc, p_prc->p_cmd_ev_io_);
+      p_prc->p_cmd_ev_io_ = NULL;
+    }
+  p_prc->pending_skips_ = 0;
   tiz_youtube_destroy (p_prc->p_youtube_);
   p_prc->p_youtube_ = NULL;
   return OMX_ErrorNone;
@@ -882,6 +986,10 @@ youtube_prc_io_ready (void * ap_prc, tiz_event_io_t * ap_ev_io, int a_fd,
 {
   youtube_prc_t * p_prc = ap_prc;
   assert (p_prc);
+  if (ap_ev_io == p_prc->p_cmd_ev_io_)
+    {
+      return process_youtube_completions (p_prc);
+    }
   return tiz_urltrans_on_io_ready (p_prc->p_trans_, ap_ev_io, a_fd, a_events);
 }
 
@@ -969,24 +1077,8 @@ youtube_prc_config_change (void * ap_prc, OMX_U32 TIZ_UNUSED (a_pid),
       tiz_check_omx (tiz_api_GetConfig (
         tiz_get_krn (handleOf (p_prc)), handleOf (p_prc),
         OMX_TizoniaIndexConfigPlaylistSkip, &p_prc->playlist_skip_));
-      p_prc->playlist_skip_.nValue > 0 ? obtain_next_url (p_prc, 1)
-                                       : obtain_next_url (p_prc, -1);
-      /* Changing the URL has the side effect of halting the current
-         download */
-      tiz_urltrans_set_uri (p_prc->p_trans_, p_prc->p_uri_param_);
-      if (p_prc->port_disabled_)
-        {
-          /* Record that the URI has changed, so that when the port is
-             re-enabled, we restart the transfer */
-          p_prc->uri_changed_ = true;
-        }
-
-      /* Get ready to auto-detect another stream */
-      set_auto_detect_on_port (p_prc);
-      prepare_for_port_auto_detection (p_prc);
-
-      /* Re-start the transfer */
-      tiz_urltrans_start (p_prc->p_trans_);
+      /* The transfer is restarted once the url has been obtained */
+      rc = request_next_url (p_prc, p_prc->playlist_skip_.nValue > 0 ? 1 : -1);
     }
   return rc;
 }
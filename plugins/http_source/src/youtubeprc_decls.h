@@ -54,6 +54,8 @@ struct youtube_prc
   OMX_PARAM_CONTENTURITYPE * p_uri_param_;
   tiz_urltrans_t * p_trans_;
   tiz_youtube_t * p_youtube_;
+  tiz_event_io_t * p_cmd_ev_io_;
+  int pending_skips_;
   bool eos_;
   bool port_disabled_;
   bool uri_changed_;